@@ -1,7 +1,34 @@
+import contextlib
+import io
+import os
+import time
+
 import numpy as np
 import streamlit as st
-import tensorflow as tf
-from PIL import Image
+
+import metrics
+from embedding_index import EMBEDDING_INDEX_DIR, INDEX_FORMAT_VERSION, OOD_MARGIN, EmbeddingIndex
+from inference_executor import (
+    INFERENCE_TIMEOUT_S,
+    TF_INTER_OP_THREADS,
+    TF_INTRA_OP_THREADS,
+    InferenceExecutor,
+    InferenceTimeoutError,
+    ServerBusyError,
+)
+from inference import (
+    CLASS_NAMES,
+    INFERENCE_BACKEND,
+    BackgroundModelLoader,
+    MAX_BATCH_SIZE,
+    model_input_size,
+    model_path_for_backend,
+    predict_batch,
+    preprocess_image,
+    validate_predictions,
+)
+from prediction_cache import PredictionCache, model_fingerprint
+from preprocessing import PREPROCESSING_VERSION, open_image, preprocess_into, thumbnail_image
 
 # --- Konfigurasi Halaman ---
 st.set_page_config(
@@ -10,23 +37,41 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded",
 )
+script_started = time.perf_counter()
+# Waktu analisis (dekode s.d. validasi) pada run ini; dikeluarkan dari durasi render
+analysis_seconds = 0.0
 
-# --- Path Model ML & Ambang Batas ---
-MODEL_PATH = "best_model.keras"
-# Tingkat keyakinan minimum untuk prediksi utama
-CONFIDENCE_THRESHOLD = 80
-# PERBAIKAN: Jarak minimum antara prediksi teratas dan kedua untuk memastikan model tidak "bingung"
-CERTAINTY_GAP_THRESHOLD = 25 
+# --- Ekspor Metrik (aktif jika AGRODETECT_METRICS=1) ---
+@st.cache_resource
+def start_metrics_exporter():
+    """Menjalankan endpoint/file metrik Prometheus sekali per server."""
+    return metrics.start_exporter()
 
-# --- Data Penyakit & Informasi (Tetap sama) ---
-CLASS_NAMES = [
-    "Pepper_bell__Bacterial_spot", "Pepper_bell__healthy", "Potato_Early_blight",
-    "Potato_Late_blight", "Potato_healthy", "Tomato_Bacterial_spot", "Tomato_Early_blight",
-    "Tomato_Late_blight", "Tomato_Leaf_Mold", "Tomato_Septoria_leaf_spot",
-    "Tomato_Spider_mites_Two_spotted_mite", "Tomato_Target_Spot",
-    "Tomato_Tomato_Yellow_Leaf_Curl_Virus", "Tomato_Tomato_mosaic_virus", "Tomato_healthy",
-]
+start_metrics_exporter()
+
+@contextlib.contextmanager
+def analysis_span():
+    """Menandai blok analisis agar durasinya tidak ikut terhitung sebagai render."""
+    global analysis_seconds
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        analysis_seconds += time.perf_counter() - started
+
+def observe_render():
+    """Mencatat durasi render run ini: waktu skrip dikurangi waktu analisis."""
+    metrics.observe_stage("render", time.perf_counter() - script_started - analysis_seconds)
+
+def rerun_script():
+    """`st.rerun()` yang tetap mencatat durasi render; rerun menghentikan skrip sebelum baris terakhir."""
+    observe_render()
+    st.rerun()
+
+# --- Model yang Dilayani (Keras, TFLite, atau server inferensi; lihat AGRODETECT_BACKEND) ---
+SERVED_MODEL_PATH = model_path_for_backend()
 
+# --- Data Penyakit & Informasi (Tetap sama) ---
 disease_info = {
     "Pepper_bell__Bacterial_spot": {
         "nama_tampilan": "Bercak Bakteri Paprika",
@@ -135,31 +180,92 @@ disease_info = {
     },
 }
 
-# --- Fungsi Praproses Gambar ---
-def preprocess_image(_image: Image.Image) -> np.ndarray:
-    """Memproses gambar yang diunggah untuk prediksi model."""
-    if _image.mode != "RGB":
-        _image = _image.convert("RGB")
-    target_size = (224, 224)
-    _image = _image.resize(target_size)
-    img_array = np.array(_image)
-    img_array = img_array / 255.0
-    img_array = np.expand_dims(img_array, axis=0)
-    return img_array
-
-# --- Cache Model ML ---
+# --- Pemuatan Model ML di Latar Belakang ---
 @st.cache_resource
+def start_model_loading():
+    """Memulai pemuatan & warm-up model di thread latar, sekali per server."""
+    return BackgroundModelLoader(SERVED_MODEL_PATH, tf_threads=(TF_INTRA_OP_THREADS, TF_INTER_OP_THREADS))
+
 def load_ml_model():
-    """Memuat model TensorFlow/Keras yang sudah dilatih."""
-    try:
-        model = tf.keras.models.load_model(MODEL_PATH)
-        return model
-    except Exception as e:
-        st.error(f"❌ **Ups!** Model Machine Learning gagal dimuat dari '{MODEL_PATH}'. Kesalahan: {e}")
-        st.warning("Pastikan `best_model.keras` berada di lokasi yang benar.")
+    """Mengambil model yang sudah siap; None jika model masih dipanaskan."""
+    loader = start_model_loading()
+    if loader.error is not None:
+        st.error(f"❌ **Ups!** Model Machine Learning gagal dimuat dari '{SERVED_MODEL_PATH}'. Kesalahan: {loader.error}")
+        st.warning(f"Pastikan `{SERVED_MODEL_PATH}` berada di lokasi yang benar.")
         st.stop()
+    return loader.model if loader.ready else None
+
+@st.fragment(run_every=1)
+def show_model_warming_up():
+    """Menampilkan status pemanasan model dan memuat ulang halaman begitu model siap."""
+    if start_model_loading().ready:
+        st.rerun()
+    st.info("⏳ **Model sedang dipanaskan...** Anda sudah bisa mengunggah foto; tombol analisis aktif sebentar lagi.")
 
 model = load_ml_model()
+# Ukuran input diambil dari model yang dilayani (mis. 160x160 untuk model student hasil distilasi)
+MODEL_INPUT_SIZE = model_input_size(model)
+
+# --- Cache Prediksi (dibagi antar sesi) ---
+@st.cache_resource
+def served_model_fingerprint():
+    """Sidik jari model yang dilayani (dihitung sekali per server)."""
+    # Backend "remote" memberi sidik jari model dari server karena file model tidak ada di proses ini
+    return getattr(model, "model_fingerprint", None) or model_fingerprint(SERVED_MODEL_PATH)
+
+@st.cache_resource
+def load_prediction_cache():
+    """Membuat cache prediksi berbasis hash gambar yang dibagi oleh semua sesi pengguna."""
+    return PredictionCache(f"{served_model_fingerprint()}:{PREPROCESSING_VERSION}")
+
+prediction_cache = load_prediction_cache() if model is not None else None
+
+# --- Indeks Embedding Daun Referensi (kasus serupa & penolakan OOD; opsional) ---
+SIMILAR_CASES_K = 4
+
+@st.cache_resource
+def load_embedding_index():
+    """Memuat indeks embedding (memory-map) jika sudah dibangun dari model yang sedang dilayani."""
+    if not hasattr(model, "predict_with_embeddings") or not os.path.exists(os.path.join(EMBEDDING_INDEX_DIR, "metadata.json")):
+        return None, None
+    index = EmbeddingIndex(EMBEDDING_INDEX_DIR)
+    # Indeks dari model lain (mis. teacher saat melayani model student) punya ruang embedding berbeda
+    if index.metadata.get("model_fingerprint") != served_model_fingerprint() or index.metadata.get("format_version") != INDEX_FORMAT_VERSION:
+        return None, None
+    # Embedding disimpan terpisah dari probabilitas, dengan kunci cache yang sama
+    embedding_cache = PredictionCache(prediction_cache.model_fingerprint, cache_dir=None)
+    return index, embedding_cache
+
+embedding_index, embedding_cache = load_embedding_index() if model is not None else (None, None)
+
+# --- Eksekutor Inferensi Bersama (konkurensi & antrean terbatas untuk semua sesi) ---
+@st.cache_resource
+def load_inference_executor():
+    """Membuat eksekutor inferensi yang dibagi oleh semua sesi pengguna, sekali per server."""
+    return InferenceExecutor()
+
+inference_executor = load_inference_executor()
+
+def run_inference(fn, *args):
+    """Menjalankan pemanggilan model lewat eksekutor bersama sambil menampilkan posisi antrean."""
+    if INFERENCE_BACKEND == "remote":
+        # Server inferensi punya antrean micro-batch sendiri; membatasi di sini hanya mengecilkan batch-nya
+        return fn(*args)
+    queue_status = st.empty()
+
+    def show_queue_position(position: int):
+        queue_status.info(f"🚦 Server sedang sibuk, permintaan Anda berada di antrean ke-{position}...")
+
+    try:
+        return inference_executor.run(fn, *args, on_queued=show_queue_position)
+    finally:
+        queue_status.empty()
+
+def get_busy_message(error: Exception) -> str:
+    """Pesan untuk pengguna saat antrean inferensi penuh atau permintaan melebihi batas waktu."""
+    if isinstance(error, ServerBusyError):
+        return f"🚦 **Server sedang sibuk** (antrean ke-{error.position}). Mohon coba lagi dalam beberapa saat."
+    return f"⌛ **Analisis melebihi batas waktu {INFERENCE_TIMEOUT_S:.0f} detik** karena server sedang ramai. Mohon coba lagi."
 
 # --- Fungsi Reset State Aplikasi ---
 def reset_app_state():
@@ -170,6 +276,9 @@ def reset_app_state():
     st.session_state.predictions_state = None
     st.session_state.show_detailed_solution = False
     st.session_state.threshold_message = None
+    st.session_state.batch_results_state = None
+    st.session_state.similar_cases_state = None
+    st.session_state.busy_message = None
 
 # --- Inisialisasi State Awal ---
 if "current_page" not in st.session_state:
@@ -177,6 +286,158 @@ if "current_page" not in st.session_state:
 if "identification_done" not in st.session_state:
     reset_app_state()
 
+# --- Mode Banyak Gambar (per Petak) ---
+def get_display_name(class_name: str) -> str:
+    """Mengambil nama tampilan kelas dari basis data penyakit."""
+    return disease_info.get(class_name, {}).get("nama_tampilan", class_name.replace("_", " ").replace("__", ": "))
+
+def analyze_batch(uploaded_files) -> list[dict]:
+    """Menganalisis banyak foto daun sekaligus dalam satu forward pass model (dipotong per batch).
+
+    Gambar yang sudah pernah dianalisis diambil dari cache prediksi tanpa didekode ulang.
+    """
+    predictions = [None] * len(uploaded_files)
+    failed = [False] * len(uploaded_files)
+    cache_keys = [prediction_cache.make_key(uploaded.getvalue()) for uploaded in uploaded_files]
+    # Buffer batch float32 dialokasikan sekali; setiap gambar ditulis langsung ke slotnya
+    batch = np.empty((len(uploaded_files),) + MODEL_INPUT_SIZE[::-1] + (3,), dtype=np.float32)
+    pending_indices = []
+    for i, uploaded in enumerate(uploaded_files):
+        predictions[i] = prediction_cache.get(cache_keys[i])
+        if predictions[i] is not None:
+            continue
+        try:
+            with metrics.timer("decode"):
+                image = open_image(uploaded)
+            # Dekode piksel JPEG (draft mode) terjadi di dalam praproses
+            with image, metrics.timer("preprocess"):
+                preprocess_into(image, batch[len(pending_indices)])
+            pending_indices.append(i)
+        except Exception:
+            failed[i] = True
+
+    if pending_indices:
+        with metrics.timer("inference"):
+            new_predictions = run_inference(predict_batch, model, batch[:len(pending_indices)], MAX_BATCH_SIZE)
+        for i, image_predictions in zip(pending_indices, new_predictions):
+            prediction_cache.put(cache_keys[i], image_predictions)
+            predictions[i] = image_predictions
+
+    valid_indices = [i for i in range(len(uploaded_files)) if not failed[i]]
+    validation = None
+    if valid_indices:
+        with metrics.timer("validation"):
+            validation = validate_predictions(np.stack([predictions[i] for i in valid_indices]))
+        metrics.count_predictions([CLASS_NAMES[index] for index in validation["top_indices"]], validation["accepted"])
+    rows = {i: row for row, i in enumerate(valid_indices)}
+    results = []
+    for i, uploaded in enumerate(uploaded_files):
+        if failed[i]:
+            results.append({"file_name": uploaded.name, "class_name": None, "confidence": None, "gap": None, "accepted": False, "error": True})
+            continue
+        row = rows[i]
+        results.append({
+            "file_name": uploaded.name,
+            "class_name": CLASS_NAMES[validation["top_indices"][row]],
+            "confidence": float(validation["top_confidences"][row]),
+            "gap": float(validation["confidence_gaps"][row]),
+            "accepted": bool(validation["accepted"][row]),
+            "error": False,
+        })
+    return results
+
+def render_batch_mode():
+    """Menampilkan unggahan banyak gambar, tabel hasil per gambar, dan ringkasan per petak."""
+    st.write("Seret & lepas beberapa foto daun dari satu petak sekaligus, atau klik untuk memilih file.")
+    uploaded_files = st.file_uploader(
+        "Pilih gambar-gambar daun (JPG, PNG):",
+        type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True,
+        label_visibility="collapsed",
+        key="batch_uploader",
+    )
+
+    if not uploaded_files:
+        st.session_state.batch_results_state = None
+        st.info("Unggah beberapa foto daun dari petak yang sama untuk mendapatkan ringkasan kondisi petak.")
+        return
+
+    st.caption(f"📁 {len(uploaded_files)} gambar siap dianalisis.")
+    if st.button(
+        "✨ **Analisis Semua Gambar!**",
+        key="analyze_batch_button",
+        help="Klik untuk mengidentifikasi penyakit pada semua foto daun sekaligus.",
+        use_container_width=True,
+        type="primary",
+        disabled=model is None,
+    ):
+        with st.spinner(f"⏳ Menganalisis {len(uploaded_files)} gambar..."), analysis_span():
+            try:
+                st.session_state.batch_results_state = analyze_batch(uploaded_files)
+            except (ServerBusyError, InferenceTimeoutError) as e:
+                st.warning(get_busy_message(e))
+                st.session_state.batch_results_state = None
+            except Exception as e:
+                st.error(f"❌ **Terjadi kesalahan saat analisis:** {e}. Mohon coba lagi.")
+                st.session_state.batch_results_state = None
+
+    results = st.session_state.batch_results_state
+    if not results:
+        return
+
+    st.markdown("---")
+    st.subheader("💡 Hasil Identifikasi per Gambar")
+    table_rows = []
+    for result in results:
+        if result["error"]:
+            diagnosis, status = "-", "❌ Gagal dibaca"
+        elif result["accepted"]:
+            diagnosis, status = get_display_name(result["class_name"]), "✅ Teridentifikasi"
+        else:
+            diagnosis, status = "Tidak dapat diidentifikasi", "⚠️ Ditolak (keyakinan rendah)"
+        table_rows.append({
+            "Nama File": result["file_name"],
+            "Hasil Diagnosis": diagnosis,
+            "Keyakinan (%)": None if result["confidence"] is None else round(result["confidence"], 2),
+            "Jarak Keyakinan (%)": None if result["gap"] is None else round(result["gap"], 2),
+            "Status": status,
+        })
+    st.dataframe(table_rows, use_container_width=True, hide_index=True)
+
+    # --- Ringkasan Kondisi Petak ---
+    st.subheader("🌾 Ringkasan Kondisi Petak")
+    accepted = [result for result in results if result["accepted"]]
+    diseased = [result for result in accepted if "healthy" not in result["class_name"].lower()]
+    col_total, col_healthy, col_diseased, col_rejected = st.columns(4)
+    col_total.metric("Total Gambar", len(results))
+    col_healthy.metric("Sehat", len(accepted) - len(diseased))
+    col_diseased.metric("Terdeteksi Penyakit", len(diseased))
+    col_rejected.metric("Tidak Teridentifikasi", len(results) - len(accepted))
+
+    if accepted:
+        class_counts = {}
+        for result in accepted:
+            class_counts[result["class_name"]] = class_counts.get(result["class_name"], 0) + 1
+        summary_rows = [
+            {
+                "Kondisi": get_display_name(class_name),
+                "Jumlah Gambar": count,
+                "Persentase (%)": round(count / len(accepted) * 100, 2),
+            }
+            for class_name, count in sorted(class_counts.items(), key=lambda item: item[1], reverse=True)
+        ]
+        st.dataframe(summary_rows, use_container_width=True, hide_index=True)
+        if diseased:
+            dominant_class = max(
+                {result["class_name"] for result in diseased},
+                key=lambda class_name: class_counts[class_name],
+            )
+            st.error(f"🚨 Penyakit dominan di petak ini: **{get_display_name(dominant_class)}** ({class_counts[dominant_class]} dari {len(accepted)} gambar teridentifikasi).")
+        else:
+            st.success("✅ Semua gambar yang teridentifikasi menunjukkan tanaman sehat.")
+    else:
+        st.warning("⚠️ Tidak ada gambar yang dapat diidentifikasi secara akurat. Mohon unggah foto daun yang lebih jelas.")
+
 # --- NAVIGASI SIDEBAR ---
 with st.sidebar:
     st.image("logo/leafy-green_1f96c.png", width=80)
@@ -186,16 +447,38 @@ with st.sidebar:
 
     if st.button("🏡 Identifikasi Tanaman", use_container_width=True, type="primary" if st.session_state.current_page == "Identifikasi" else "secondary"):
         st.session_state.current_page = "Identifikasi"
-        st.rerun()
+        rerun_script()
 
     if st.button("💡 Tentang AgroDetect", use_container_width=True, type="primary" if st.session_state.current_page == "Tentang" else "secondary"):
         st.session_state.current_page = "Tentang"
-        st.rerun()
+        rerun_script()
 
     if st.button("👥 Tim Pengembang", use_container_width=True, type="primary" if st.session_state.current_page == "Tim" else "secondary"):
         st.session_state.current_page = "Tim"
-        st.rerun()
+        rerun_script()
 
+    if prediction_cache is not None:
+        cache_stats = prediction_cache.stats()
+        for stat in ("hits", "misses", "size"):
+            metrics.set_gauge(f"agrodetect_prediction_cache_{stat}", cache_stats[stat])
+        st.caption(
+            f"🗃️ Cache prediksi: {cache_stats['hits']} hit / {cache_stats['misses']} miss "
+            f"({cache_stats['hit_rate']:.0%}), {cache_stats['size']}/{cache_stats['max_size']} entri"
+        )
+        executor_stats = inference_executor.stats()
+        for stat in ("rejected", "timed_out"):
+            metrics.set_gauge(f"agrodetect_inference_{stat}", executor_stats[stat])
+        st.caption(
+            f"🚦 Inferensi: {executor_stats['running']} berjalan / {executor_stats['waiting']} antre "
+            f"(maks. {inference_executor.max_concurrency} bersamaan)"
+        )
+        startup = start_model_loading().timings
+        st.caption(
+            f"⚡ Model siap dalam {startup['total_s']:.1f} dtk (impor {startup['import_s']:.1f} · "
+            f"muat {startup['load_s']:.1f} · pemanasan {startup['warmup_s']:.1f})"
+        )
+    else:
+        st.caption("⏳ Model sedang dipanaskan...")
     st.divider()
     st.info("AgroDetect: Mempermudah petani mendeteksi penyakit dan hama dengan AI.")
     st.caption("© 2025 Laskar AI Capstone")
@@ -207,166 +490,229 @@ if st.session_state.current_page == "Identifikasi":
     st.divider()
 
     st.subheader("📸 Unggah Foto Daun")
-    st.write("Seret & lepas gambar di sini, atau klik untuk memilih file.")
-    
-    uploaded_file = st.file_uploader(
-        "Pilih gambar daun (JPG, PNG):",
-        type=["jpg", "jpeg", "png"],
-        label_visibility="collapsed",
+    if model is None:
+        show_model_warming_up()
+    batch_mode = st.toggle(
+        "🗂️ Mode Banyak Gambar (per Petak)",
+        key="batch_mode",
+        help="Unggah banyak foto daun dari satu petak sekaligus dan analisis dalam satu kali proses.",
+        on_change=reset_app_state,
     )
 
-    if uploaded_file is None:
-        if st.session_state.identification_done:
-            reset_app_state()
-        st.markdown(
-            "<div style='border: 2px dashed #4CAF50; padding: 50px; text-align: center; opacity: 0.7;'>"
-            "Tidak ada gambar diunggah."
-            "</div>",
-            unsafe_allow_html=True,
+    if batch_mode:
+        render_batch_mode()
+    else:
+        st.write("Seret & lepas gambar di sini, atau klik untuk memilih file.")
+    
+        uploaded_file = st.file_uploader(
+            "Pilih gambar daun (JPG, PNG):",
+            type=["jpg", "jpeg", "png"],
+            label_visibility="collapsed",
         )
-        st.info("Unggah foto daun yang jelas agar hasil identifikasi lebih akurat. Fokus pada area yang menunjukkan gejala.")
 
-    if uploaded_file is not None:
-        try:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Foto Daun Anda", use_container_width=True)
+        if uploaded_file is None:
+            if st.session_state.identification_done:
+                reset_app_state()
+            st.markdown(
+                "<div style='border: 2px dashed #4CAF50; padding: 50px; text-align: center; opacity: 0.7;'>"
+                "Tidak ada gambar diunggah."
+                "</div>",
+                unsafe_allow_html=True,
+            )
+            st.info("Unggah foto daun yang jelas agar hasil identifikasi lebih akurat. Fokus pada area yang menunjukkan gejala.")
 
-            if st.button(
-                "✨ **Mulai Analisis Cerdas!**",
-                key="analyze_button",
-                help="Klik untuk mengidentifikasi penyakit pada foto daun Anda.",
-                use_container_width=True,
-                type="primary",
-            ):
-                reset_app_state() 
+        if uploaded_file is not None:
+            try:
+                image_bytes = uploaded_file.getvalue()
+                # Hanya salinan kecil yang didekode untuk ditampilkan; prediksi memakai handle baru
+                with open_image(io.BytesIO(image_bytes)) as image:
+                    display_image = thumbnail_image(image)
+                st.image(display_image, caption="Foto Daun Anda", use_container_width=True)
 
-                with st.spinner("⏳ Analisis sedang berlangsung..."):
-                    try:
-                        processed_image = preprocess_image(image)
-                        predictions = model.predict(processed_image)[0] # Ambil array probabilitas
-                        
-                        # --- LOGIKA VALIDASI DUA TINGKAT ---
-                        # 1. Urutkan prediksi dari tertinggi ke terendah
-                        sorted_indices = np.argsort(predictions)[::-1]
-                        top_pred_index = sorted_indices[0]
-                        top_pred_confidence = predictions[top_pred_index] * 100
-                        
-                        second_pred_confidence = predictions[sorted_indices[1]] * 100
+                if st.button(
+                    "✨ **Mulai Analisis Cerdas!**",
+                    key="analyze_button",
+                    help="Klik untuk mengidentifikasi penyakit pada foto daun Anda.",
+                    use_container_width=True,
+                    type="primary",
+                    disabled=model is None,
+                ):
+                    reset_app_state() 
+
+                    with st.spinner("⏳ Analisis sedang berlangsung..."), analysis_span():
+                        try:
+                            cache_key = prediction_cache.make_key(image_bytes)
+                            predictions = prediction_cache.get(cache_key)
+                            embedding = embedding_cache.get(cache_key) if embedding_index is not None else None
+                            if predictions is None or (embedding_index is not None and embedding is None):
+                                with metrics.timer("decode"):
+                                    analysis_image = open_image(io.BytesIO(image_bytes))
+                                # Handle yang belum dimuat agar draft mode JPEG berlaku (dekode piksel terjadi di sini)
+                                with analysis_image, metrics.timer("preprocess"):
+                                    processed_image = preprocess_image(analysis_image, MODEL_INPUT_SIZE)
+                                with metrics.timer("inference"):
+                                    if embedding_index is not None:
+                                        # Probabilitas dan embedding dari satu forward pass yang sama
+                                        batch_predictions, batch_embeddings = run_inference(model.predict_with_embeddings, processed_image)
+                                        predictions, embedding = batch_predictions[0], batch_embeddings[0]
+                                        embedding_cache.put(cache_key, embedding)
+                                    else:
+                                        predictions = run_inference(model.predict, processed_image)[0] # Ambil array probabilitas
+                                prediction_cache.put(cache_key, predictions)
                         
-                        # 2. Hitung jarak keyakinan
-                        confidence_gap = top_pred_confidence - second_pred_confidence
-
-                        # 3. Terapkan validasi
-                        is_confident = top_pred_confidence >= CONFIDENCE_THRESHOLD
-                        is_certain = confidence_gap >= CERTAINTY_GAP_THRESHOLD
-
-                        if not (is_confident and is_certain):
-                            st.session_state.threshold_message = (
-                                f"⚠️ **Tidak Dapat Diidentifikasi Secara Akurat!**\n\n"
-                                f"Model tidak dapat mengenali gambar ini dengan keyakinan dan kepastian yang cukup.\n"
-                                f"*(Keyakinan teratas: {top_pred_confidence:.2f}%, Jarak keyakinan: {confidence_gap:.2f}%)*\n\n"
-                                f"**Kemungkinan Penyebab:**\n"
-                                f"- Gambar bukan daun tomat, kentang, atau paprika.\n"
-                                f"- Kualitas gambar kurang jelas (buram, terlalu gelap/terang).\n"
-                                f"- Model ragu-ragu antara dua kemungkinan penyakit.\n\n"
-                                f"Mohon unggah gambar daun yang lebih jelas dan fokus dari tanaman yang didukung."
-                            )
-                        else:
-                            st.session_state.threshold_message = None
-                            st.session_state.predictions_state = [predictions] # Simpan dalam list untuk konsistensi
-                            st.session_state.confidence_state = top_pred_confidence
-                            st.session_state.predicted_class_name_state = CLASS_NAMES[top_pred_index]
+                            # --- LOGIKA VALIDASI DUA TINGKAT (+ penolakan OOD jika indeks tersedia) ---
+                            with metrics.timer("validation"):
+                                validation = validate_predictions(predictions)
+                            is_ood = False
+                            if embedding is not None:
+                                with metrics.timer("similarity"):
+                                    ood = embedding_index.ood_scores(embedding)
+                                    similarities, reference_indices = embedding_index.search(embedding, k=SIMILAR_CASES_K)
+                                is_ood = bool(ood["is_ood"][0])
+                                st.session_state.similar_cases_state = [
+                                    {
+                                        "path": embedding_index.paths[reference],
+                                        "class_name": CLASS_NAMES[embedding_index.labels[reference]],
+                                        "similarity": float(similarity),
+                                    }
+                                    for similarity, reference in zip(similarities[0], reference_indices[0])
+                                    if reference >= 0
+                                ]
+                            metrics.count_predictions([CLASS_NAMES[validation["top_indices"][0]]], [bool(validation["accepted"][0]) and not is_ood])
+                            top_pred_index = int(validation["top_indices"][0])
+                            top_pred_confidence = float(validation["top_confidences"][0])
+                            confidence_gap = float(validation["confidence_gaps"][0])
+
+                            if is_ood:
+                                st.session_state.threshold_message = (
+                                    f"⚠️ **Gambar Tidak Dikenali sebagai Daun yang Didukung!**\n\n"
+                                    f"Ciri visual gambar ini jauh dari semua daun paprika, tomat, dan kentang yang pernah dipelajari model "
+                                    f"(skor kejanggalan: {ood['scores'][0]:.2f}, batas: {OOD_MARGIN:.2f}).\n\n"
+                                    f"Mohon unggah foto satu daun dari tanaman yang didukung dengan latar yang jelas."
+                                )
+                            elif not validation["accepted"][0]:
+                                st.session_state.threshold_message = (
+                                    f"⚠️ **Tidak Dapat Diidentifikasi Secara Akurat!**\n\n"
+                                    f"Model tidak dapat mengenali gambar ini dengan keyakinan dan kepastian yang cukup.\n"
+                                    f"*(Keyakinan teratas: {top_pred_confidence:.2f}%, Jarak keyakinan: {confidence_gap:.2f}%)*\n\n"
+                                    f"**Kemungkinan Penyebab:**\n"
+                                    f"- Gambar bukan daun tomat, kentang, atau paprika.\n"
+                                    f"- Kualitas gambar kurang jelas (buram, terlalu gelap/terang).\n"
+                                    f"- Model ragu-ragu antara dua kemungkinan penyakit.\n\n"
+                                    f"Mohon unggah gambar daun yang lebih jelas dan fokus dari tanaman yang didukung."
+                                )
+                            else:
+                                st.session_state.threshold_message = None
+                                st.session_state.predictions_state = [predictions] # Simpan dalam list untuk konsistensi
+                                st.session_state.confidence_state = top_pred_confidence
+                                st.session_state.predicted_class_name_state = CLASS_NAMES[top_pred_index]
                         
-                        st.session_state.identification_done = True
+                            st.session_state.identification_done = True
 
-                    except Exception as e:
-                        st.error(f"❌ **Terjadi kesalahan saat analisis:** {e}. Mohon coba lagi.")
-                        st.session_state.identification_done = False
+                        except (ServerBusyError, InferenceTimeoutError) as e:
+                            st.session_state.busy_message = get_busy_message(e)
+                            st.session_state.identification_done = False
+                        except Exception as e:
+                            st.error(f"❌ **Terjadi kesalahan saat analisis:** {e}. Mohon coba lagi.")
+                            st.session_state.identification_done = False
                 
-                st.rerun()
+                    rerun_script()
 
-        except Exception as e:
-            st.error(f"Gagal memuat atau menampilkan gambar: {e}. Pastikan file valid.")
-            reset_app_state()
-            st.rerun()
+            except Exception as e:
+                st.error(f"Gagal memuat atau menampilkan gambar: {e}. Pastikan file valid.")
+                reset_app_state()
+                rerun_script()
             
-    # Bagian untuk menampilkan hasil identifikasi dan solusi
-    if st.session_state.identification_done:
-        st.markdown("---")
-        st.subheader("💡 Hasil Identifikasi")
+        if st.session_state.get("busy_message"):
+            st.warning(st.session_state.busy_message)
 
-        if st.session_state.threshold_message:
-            st.warning(st.session_state.threshold_message)
-        else:
-            confidence = st.session_state.confidence_state
-            predicted_class_name = st.session_state.predicted_class_name_state
-            info = disease_info.get(predicted_class_name, {})
-            display_name = info.get("nama_tampilan", predicted_class_name.replace("_", " ").replace("__", ": "))
-            brief_description = info.get("deskripsi_singkat", "Informasi tambahan tidak tersedia.")
-
-            if "healthy" in predicted_class_name.lower():
-                st.success(f"✅ Tanaman Sehat: {display_name}")
-                st.metric(label="Tingkat Keyakinan", value=f"{confidence:.2f}%", delta="Sehat", delta_color="normal")
+        # Bagian untuk menampilkan hasil identifikasi dan solusi
+        if st.session_state.identification_done:
+            st.markdown("---")
+            st.subheader("💡 Hasil Identifikasi")
+
+            if st.session_state.threshold_message:
+                st.warning(st.session_state.threshold_message)
             else:
-                st.error(f"🚨 Terdeteksi: {display_name}")
-                st.metric(label="Tingkat Keyakinan", value=f"{confidence:.2f}%", delta="Penyakit Terdeteksi", delta_color="inverse")
+                confidence = st.session_state.confidence_state
+                predicted_class_name = st.session_state.predicted_class_name_state
+                info = disease_info.get(predicted_class_name, {})
+                display_name = info.get("nama_tampilan", predicted_class_name.replace("_", " ").replace("__", ": "))
+                brief_description = info.get("deskripsi_singkat", "Informasi tambahan tidak tersedia.")
+
+                if "healthy" in predicted_class_name.lower():
+                    st.success(f"✅ Tanaman Sehat: {display_name}")
+                    st.metric(label="Tingkat Keyakinan", value=f"{confidence:.2f}%", delta="Sehat", delta_color="normal")
+                else:
+                    st.error(f"🚨 Terdeteksi: {display_name}")
+                    st.metric(label="Tingkat Keyakinan", value=f"{confidence:.2f}%", delta="Penyakit Terdeteksi", delta_color="inverse")
             
-            st.markdown(f"**Ringkasan:** {brief_description}")
-            if st.button("📖 Lihat Detail Solusi & Penanganan", use_container_width=True):
-                st.session_state.show_detailed_solution = True
-                st.rerun()
-
-        st.markdown("---")
-        if st.button(
-            "🔄 **Analisis Gambar Lain**",
-            help="Klik untuk kembali ke halaman unggah.",
-            use_container_width=True,
-            type="secondary",
-        ):
-            reset_app_state()
-            st.rerun()
-
-    # Bagian untuk menampilkan solusi detail
-    if st.session_state.get("show_detailed_solution", False) and st.session_state.identification_done and not st.session_state.threshold_message:
-        st.markdown("---")
-        current_display_name = disease_info.get(st.session_state.predicted_class_name_state, {}).get("nama_tampilan", st.session_state.predicted_class_name_state.replace("_", " ").replace("__", ": "))
-        st.header(f"🌿 Penanganan Detail untuk {current_display_name}")
-        info_detail = disease_info.get(st.session_state.predicted_class_name_state, {})
-        if info_detail:
-            col_detail_1, col_detail_2 = st.columns(2)
-            with col_detail_1:
-                with st.expander("📚 **Penyebab & Gejala Khas**", expanded=True):
-                    st.markdown(f"**Penyebab Utama:** {info_detail.get('penyebab', 'Tidak tersedia.')}")
-                    st.markdown("**Gejala yang Perlu Diperhatikan:**")
-                    if isinstance(info_detail.get("gejala"), list):
-                        for symptom in info_detail["gejala"]:
-                            st.markdown(f"- {symptom}")
-                    else:
-                        st.write(info_detail.get("gejala", "Tidak tersedia."))
-            with col_detail_2:
-                with st.expander("👨‍🌾 **Langkah Solusi & Penanganan**", expanded=True):
-                    st.markdown("**Rekomendasi:**")
-                    if isinstance(info_detail.get("solusi"), list):
-                        for solution_step in info_detail["solusi"]:
-                            st.markdown(f"- {solution_step}")
-                    else:
-                        st.write(info_detail.get("solusi", "Tidak tersedia."))
-            st.divider()
-            if st.session_state.predictions_state is not None:
-                with st.expander("🔬 **Probabilitas Lengkap (Untuk Ahli)**"):
-                    st.write("Berikut adalah daftar probabilitas model untuk setiap kategori, dari tertinggi ke terendah:")
-                    # Ambil kembali array probabilitas dari state
-                    current_predictions = st.session_state.predictions_state[0]
-                    sorted_indices = np.argsort(current_predictions)[::-1]
-                    for i in sorted_indices:
-                        prob = current_predictions[i] * 100
-                        class_disp = disease_info.get(CLASS_NAMES[i], {}).get("nama_tampilan", CLASS_NAMES[i].replace("_", " ").replace("__", ": "))
-                        if i == np.argmax(current_predictions):
-                            st.markdown(f"- **{class_disp}: {prob:.2f}%** (Prediksi Utama)")
+                st.markdown(f"**Ringkasan:** {brief_description}")
+                similar_cases = st.session_state.get("similar_cases_state")
+                if similar_cases:
+                    st.markdown("**🔎 Kasus Serupa dari Data Referensi:**")
+                    for column, case in zip(st.columns(len(similar_cases)), similar_cases):
+                        with column:
+                            caption = f"{get_display_name(case['class_name'])} (kemiripan {case['similarity']:.0%})"
+                            if os.path.exists(case["path"]):
+                                st.image(case["path"], caption=caption, use_container_width=True)
+                            else:
+                                st.caption(caption)
+                if st.button("📖 Lihat Detail Solusi & Penanganan", use_container_width=True):
+                    st.session_state.show_detailed_solution = True
+                    rerun_script()
+
+            st.markdown("---")
+            if st.button(
+                "🔄 **Analisis Gambar Lain**",
+                help="Klik untuk kembali ke halaman unggah.",
+                use_container_width=True,
+                type="secondary",
+            ):
+                reset_app_state()
+                rerun_script()
+
+        # Bagian untuk menampilkan solusi detail
+        if st.session_state.get("show_detailed_solution", False) and st.session_state.identification_done and not st.session_state.threshold_message:
+            st.markdown("---")
+            current_display_name = disease_info.get(st.session_state.predicted_class_name_state, {}).get("nama_tampilan", st.session_state.predicted_class_name_state.replace("_", " ").replace("__", ": "))
+            st.header(f"🌿 Penanganan Detail untuk {current_display_name}")
+            info_detail = disease_info.get(st.session_state.predicted_class_name_state, {})
+            if info_detail:
+                col_detail_1, col_detail_2 = st.columns(2)
+                with col_detail_1:
+                    with st.expander("📚 **Penyebab & Gejala Khas**", expanded=True):
+                        st.markdown(f"**Penyebab Utama:** {info_detail.get('penyebab', 'Tidak tersedia.')}")
+                        st.markdown("**Gejala yang Perlu Diperhatikan:**")
+                        if isinstance(info_detail.get("gejala"), list):
+                            for symptom in info_detail["gejala"]:
+                                st.markdown(f"- {symptom}")
                         else:
-                            st.write(f"- {class_disp}: {prob:.2f}%")
-        else:
-            st.warning("Maaf, informasi detail untuk hasil ini tidak tersedia dalam basis data kami.")
+                            st.write(info_detail.get("gejala", "Tidak tersedia."))
+                with col_detail_2:
+                    with st.expander("👨‍🌾 **Langkah Solusi & Penanganan**", expanded=True):
+                        st.markdown("**Rekomendasi:**")
+                        if isinstance(info_detail.get("solusi"), list):
+                            for solution_step in info_detail["solusi"]:
+                                st.markdown(f"- {solution_step}")
+                        else:
+                            st.write(info_detail.get("solusi", "Tidak tersedia."))
+                st.divider()
+                if st.session_state.predictions_state is not None:
+                    with st.expander("🔬 **Probabilitas Lengkap (Untuk Ahli)**"):
+                        st.write("Berikut adalah daftar probabilitas model untuk setiap kategori, dari tertinggi ke terendah:")
+                        # Ambil kembali array probabilitas dari state
+                        current_predictions = st.session_state.predictions_state[0]
+                        sorted_indices = np.argsort(current_predictions)[::-1]
+                        for i in sorted_indices:
+                            prob = current_predictions[i] * 100
+                            class_disp = disease_info.get(CLASS_NAMES[i], {}).get("nama_tampilan", CLASS_NAMES[i].replace("_", " ").replace("__", ": "))
+                            if i == np.argmax(current_predictions):
+                                st.markdown(f"- **{class_disp}: {prob:.2f}%** (Prediksi Utama)")
+                            else:
+                                st.write(f"- {class_disp}: {prob:.2f}%")
+            else:
+                st.warning("Maaf, informasi detail untuk hasil ini tidak tersedia dalam basis data kami.")
 
 elif st.session_state.current_page == "Tentang":
     st.title("💡 Tentang AgroDetect")
@@ -421,3 +767,5 @@ elif st.session_state.current_page == "Tim":
 
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: grey;'>© 2025 AgroDetect. Hak cipta dilindungi.</p>", unsafe_allow_html=True)
+
+observe_render()
@@ -0,0 +1,237 @@
+"""Diagnosis massal tanpa UI untuk folder gambar dari kamera lapangan.
+
+Gambar dibaca secara malas (lazy) dari folder atau daftar file, didekode di thread pool sambil
+batch sebelumnya diproses model, lalu hasilnya ditulis bertahap ke JSONL/CSV. Memori tetap
+terbatas berapa pun ukuran dataset. Jika dijalankan ulang dengan file output yang sama, gambar
+yang sudah tercatat dilewati sehingga proses berlanjut dari titik terakhir.
+
+Contoh:
+    python batch_diagnose.py /data/kamera/2025-06-12 --output hasil.jsonl
+    python batch_diagnose.py --file-list daftar.txt --output hasil.csv --batch-size 64
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from inference import (
+    CERTAINTY_GAP_THRESHOLD,
+    CLASS_NAMES,
+    CONFIDENCE_THRESHOLD,
+    INFERENCE_BACKEND,
+    MAX_BATCH_SIZE,
+    load_inference_model,
+    model_input_size,
+    model_path_for_backend,
+    validate_predictions,
+)
+from preprocessing import open_image, preprocess_into
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+OUTPUT_FIELDS = ["path", "class_name", "confidence", "confidence_gap", "accepted", "error"]
+
+
+# --- Sumber Gambar ---
+def iter_image_paths(root: str):
+    """Menelusuri folder secara rekursif dan menghasilkan path gambar satu per satu (urutan stabil)."""
+    with os.scandir(root) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_image_paths(entry.path)
+        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            yield entry.path
+
+
+def iter_file_list(file_list: str):
+    """Membaca path gambar dari file teks (satu path per baris)."""
+    with open(file_list, encoding="utf-8") as paths:
+        for line in paths:
+            path = line.strip()
+            if path:
+                yield path
+
+
+def iter_batches(paths, batch_size: int):
+    """Memotong iterator path menjadi list berukuran `batch_size`."""
+    paths = iter(paths)
+    while batch := list(islice(paths, batch_size)):
+        yield batch
+
+
+def decode_into(path: str, out: np.ndarray) -> None:
+    """Mendekode dan memproses satu gambar langsung ke slot buffer batch `out`."""
+    with open_image(path) as image:
+        preprocess_into(image, out)
+
+
+# --- Output & Resume ---
+def load_processed_paths(output_path: str) -> set[str]:
+    """Membaca path yang sudah tercatat di file output agar bisa dilewati saat dijalankan ulang."""
+    if not os.path.exists(output_path):
+        return set()
+    processed = set()
+    with open(output_path, encoding="utf-8", newline="") as output_file:
+        if output_path.endswith(".csv"):
+            for row in csv.DictReader(output_file):
+                if row.get("path"):
+                    processed.add(row["path"])
+        else:
+            for line in output_file:
+                try:
+                    processed.add(json.loads(line)["path"])
+                except (json.JSONDecodeError, KeyError):
+                    # Baris terakhir bisa terpotong jika proses sebelumnya terhenti
+                    continue
+    return processed
+
+
+class ResultWriter:
+    """Menulis hasil per baris ke JSONL atau CSV (mode append) dan flush setiap batch."""
+
+    def __init__(self, output_path: str):
+        self.is_csv = output_path.endswith(".csv")
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        if not is_new:
+            with open(output_path, "rb") as existing:
+                existing.seek(-1, os.SEEK_END)
+                needs_newline = existing.read(1) != b"\n"
+        self._file = open(output_path, "a", encoding="utf-8", newline="")
+        if not is_new and needs_newline:
+            self._file.write("\n")
+        if self.is_csv:
+            self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+            if is_new:
+                self._writer.writeheader()
+
+    def write(self, rows: list[dict]) -> None:
+        for row in rows:
+            if self.is_csv:
+                self._writer.writerow(row)
+            else:
+                self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# --- Pipeline Diagnosis ---
+def diagnose(
+    paths,
+    model,
+    writer: ResultWriter,
+    batch_size: int = MAX_BATCH_SIZE,
+    num_workers: int = 4,
+    prefetch_batches: int = 2,
+    confidence_threshold: float = CONFIDENCE_THRESHOLD,
+    certainty_gap_threshold: float = CERTAINTY_GAP_THRESHOLD,
+) -> dict:
+    """Mendekode batch berikutnya di thread pool selagi batch saat ini diprediksi, lalu menulis hasil.
+
+    Paling banyak `prefetch_batches` batch berada di memori sekaligus.
+    """
+    counts = {"processed": 0, "accepted": 0, "rejected": 0, "errors": 0}
+    input_size = model_input_size(model)
+    batches = iter_batches(paths, batch_size)
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+
+        def submit_next_batch() -> None:
+            batch_paths = next(batches, None)
+            if batch_paths is not None:
+                buffer = np.empty((len(batch_paths),) + input_size[::-1] + (3,), dtype=np.float32)
+                futures = [executor.submit(decode_into, path, buffer[i]) for i, path in enumerate(batch_paths)]
+                pending.append((batch_paths, buffer, futures))
+
+        for _ in range(prefetch_batches):
+            submit_next_batch()
+
+        while pending:
+            batch_paths, buffer, futures = pending.popleft()
+            submit_next_batch()
+
+            rows, decoded_indices = [], []
+            for i, (path, future) in enumerate(zip(batch_paths, futures)):
+                try:
+                    future.result()
+                    decoded_indices.append(i)
+                except Exception as e:
+                    rows.append({"path": path, "class_name": None, "confidence": None, "confidence_gap": None, "accepted": False, "error": str(e)})
+
+            if decoded_indices:
+                # Gambar yang gagal didekode dibuang; jika semua berhasil, buffer dipakai tanpa salinan
+                batch = buffer if len(decoded_indices) == len(batch_paths) else buffer[decoded_indices]
+                predictions = model.predict(batch, verbose=0)
+                validation = validate_predictions(predictions, confidence_threshold, certainty_gap_threshold)
+                for row, i in enumerate(decoded_indices):
+                    rows.append({
+                        "path": batch_paths[i],
+                        "class_name": CLASS_NAMES[validation["top_indices"][row]],
+                        "confidence": round(float(validation["top_confidences"][row]), 4),
+                        "confidence_gap": round(float(validation["confidence_gaps"][row]), 4),
+                        "accepted": bool(validation["accepted"][row]),
+                        "error": None,
+                    })
+
+            writer.write(rows)
+            for row in rows:
+                counts["processed"] += 1
+                if row["error"]:
+                    counts["errors"] += 1
+                elif row["accepted"]:
+                    counts["accepted"] += 1
+                else:
+                    counts["rejected"] += 1
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Diagnosis massal penyakit daun dari folder gambar (tanpa UI).")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("input_dir", nargs="?", help="Folder gambar (ditelusuri rekursif).")
+    source.add_argument("--file-list", help="File teks berisi satu path gambar per baris.")
+    parser.add_argument("--output", required=True, help="File hasil (.jsonl atau .csv); dilanjutkan jika sudah ada.")
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, choices=["keras", "tflite", "remote"])
+    parser.add_argument("--model", default=None, help="Path model (default sesuai backend).")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=4, help="Jumlah thread dekode gambar.")
+    parser.add_argument("--confidence-threshold", type=float, default=CONFIDENCE_THRESHOLD)
+    parser.add_argument("--certainty-gap-threshold", type=float, default=CERTAINTY_GAP_THRESHOLD)
+    args = parser.parse_args()
+
+    processed = load_processed_paths(args.output)
+    paths = iter_file_list(args.file_list) if args.file_list else iter_image_paths(args.input_dir)
+    paths = (path for path in paths if path not in processed)
+    if processed:
+        print(f"↩️  Melanjutkan: {len(processed)} gambar sudah tercatat di {args.output}", file=sys.stderr)
+
+    model = load_inference_model(args.model or model_path_for_backend(args.backend), backend=args.backend)
+    writer = ResultWriter(args.output)
+    try:
+        counts = diagnose(
+            paths,
+            model,
+            writer,
+            batch_size=args.batch_size,
+            num_workers=args.workers,
+            confidence_threshold=args.confidence_threshold,
+            certainty_gap_threshold=args.certainty_gap_threshold,
+        )
+    finally:
+        writer.close()
+    print(
+        f"✅ Selesai: {counts['processed']} gambar diproses "
+        f"({counts['accepted']} teridentifikasi, {counts['rejected']} ditolak, {counts['errors']} gagal dibaca).",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Benchmark jalur panas inferensi AgroDetect: praproses gambar dan pemanggilan model.
+
+Gambar sintetis dibuat di memori dengan ukuran realistis (PNG kecil, JPEG 12 MP, PNG RGBA,
+JPEG grayscale), lalu diukur:
+- praproses (`open_image` + `preprocess_batch`) per jenis gambar dan per jumlah thread,
+- pemanggilan model per ukuran batch,
+dengan latensi p50/p95/p99, gambar/detik, dan puncak RSS. Hasil ditulis sebagai JSON agar
+dapat dibandingkan antar-run (`--compare`).
+
+Berjalan offline di CPU: jika `best_model.keras` tidak ada (atau `--random-model`), dipakai
+model acak dengan arsitektur yang sama (MobileNetV2 tanpa bobot ImageNet + head).
+
+Jumlah thread TensorFlow hanya bisa diatur sebelum runtime diinisialisasi, sehingga
+`--thread-sweep` menjalankan setiap nilai thread di subproses terpisah.
+
+Contoh:
+    python benchmark.py --output bench.json
+    python benchmark.py --thread-sweep 1 2 4 --batch-sizes 1 8 32 --output bench.json
+    python benchmark.py --output bench_baru.json --compare bench.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from inference import CLASS_NAMES, INFERENCE_BACKEND, MODEL_PATH, load_inference_model, model_path_for_backend
+from inference_executor import configure_tf_threads
+from preprocessing import open_image, preprocess_batch
+
+# --- Gambar Sintetis ---
+SYNTHETIC_IMAGES = {
+    "png_small_rgb": ((256, 256), "RGB", "PNG"),
+    "jpeg_12mp_rgb": ((4032, 3024), "RGB", "JPEG"),
+    "png_rgba": ((1024, 1024), "RGBA", "PNG"),
+    "jpeg_grayscale": ((1600, 1200), "L", "JPEG"),
+}
+
+
+def make_synthetic_image(size: tuple[int, int], mode: str, image_format: str, seed: int = 0) -> bytes:
+    """Membuat gambar acak yang halus (agar ukuran hasil kompresi realistis) dan mengembalikan byte-nya."""
+    rng = np.random.default_rng(seed)
+    channels = {"RGB": 3, "RGBA": 4, "L": 1}[mode]
+    # Noise resolusi rendah yang diperbesar menyerupai tekstur daun daripada noise per piksel
+    coarse = rng.integers(0, 256, size=(size[1] // 32 + 1, size[0] // 32 + 1, channels), dtype=np.uint8)
+    image = Image.fromarray(coarse.squeeze(axis=2) if channels == 1 else coarse).resize(size, Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **({"quality": 90} if image_format == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+# --- Statistik ---
+def summarize(latencies_s: list[float], images_per_call: int = 1) -> dict:
+    """Persentil latensi (ms) dan throughput dari daftar durasi per panggilan."""
+    latencies_ms = np.array(latencies_s) * 1000
+    return {
+        "calls": len(latencies_ms),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(latencies_ms.mean()),
+        "images_per_s": float(images_per_call * len(latencies_ms) / max(latencies_ms.sum() / 1000, 1e-9)),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Puncak RSS proses ini (MB; ru_maxrss di Linux dalam KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# --- Benchmark Praproses ---
+def bench_preprocess(image_bytes: bytes, repeats: int) -> dict:
+    """Latensi praproses satu gambar (decode + resize + normalisasi)."""
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        with open_image(io.BytesIO(image_bytes)) as image:
+            preprocess_batch([image])
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+
+def bench_preprocess_threads(image_bytes: bytes, num_threads: int, num_images: int) -> dict:
+    """Throughput praproses paralel dengan `num_threads` thread untuk `num_images` gambar."""
+
+    def work(_) -> float:
+        started = time.perf_counter()
+        with open_image(io.BytesIO(image_bytes)) as image:
+            preprocess_batch([image])
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        latencies = list(executor.map(work, range(num_images)))
+    wall_s = time.perf_counter() - started
+    stats = summarize(latencies)
+    stats["images_per_s"] = num_images / wall_s
+    return stats
+
+
+# --- Benchmark Model ---
+def build_random_model():
+    """Model acak berarsitektur sama dengan produksi (tanpa unduh bobot, bisa offline)."""
+    from training import assemble_model, build_backbone, build_head
+
+    return assemble_model(build_backbone(weights=None), build_head(len(CLASS_NAMES)))
+
+
+def load_benchmark_model(args):
+    """Memuat model produksi, atau model acak jika file model tidak ada / diminta."""
+    model_path = args.model or model_path_for_backend(args.backend)
+    if args.random_model or (args.backend != "remote" and not os.path.exists(model_path)):
+        from inference import CompiledPredictor
+
+        model = build_random_model()
+        model = CompiledPredictor(model) if args.compiled else model
+        return model, "random"
+    return load_inference_model(model_path, backend=args.backend, compiled=args.compiled), model_path
+
+
+def bench_model(model, batch_size: int, repeats: int) -> dict:
+    """Latensi pemanggilan model per batch (setelah satu panggilan pemanasan)."""
+    batch = np.random.default_rng(0).uniform(-1, 1, size=(batch_size,) + tuple(model.input_shape[1:])).astype(np.float32)
+    model.predict(batch, verbose=0)
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model.predict(batch, verbose=0)
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies, images_per_call=batch_size)
+
+
+def run_benchmarks(args) -> dict:
+    if args.threads is not None:
+        configure_tf_threads(args.threads, args.threads)
+    results = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "tf_threads": args.threads,
+            "backend": args.backend,
+            "compiled": args.compiled,
+        },
+        "preprocess": {},
+        "preprocess_threads": {},
+        "model": {},
+    }
+    synthetic = {name: make_synthetic_image(*spec) for name, spec in SYNTHETIC_IMAGES.items()}
+    for name, image_bytes in synthetic.items():
+        results["preprocess"][name] = bench_preprocess(image_bytes, args.repeats)
+        results["preprocess"][name]["bytes"] = len(image_bytes)
+        for num_threads in args.preprocess_threads:
+            results["preprocess_threads"][f"{name}/threads={num_threads}"] = bench_preprocess_threads(
+                image_bytes, num_threads, num_images=max(args.repeats, num_threads * 4)
+            )
+    results["metadata"]["peak_rss_mb_after_preprocess"] = peak_rss_mb()
+
+    if not args.skip_model:
+        import tensorflow as tf
+
+        results["metadata"]["tensorflow"] = tf.__version__
+        model, model_source = load_benchmark_model(args)
+        results["metadata"]["model"] = model_source
+        for batch_size in args.batch_sizes:
+            results["model"][f"batch={batch_size}"] = bench_model(model, batch_size, args.repeats)
+    results["metadata"]["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def run_thread_sweep(args) -> dict:
+    """Menjalankan benchmark model di subproses terpisah untuk setiap jumlah thread TF."""
+    sweep = {}
+    for num_threads in args.thread_sweep:
+        command = [sys.executable, __file__, "--threads", str(num_threads), "--output", "-", "--repeats", str(args.repeats),
+                   "--backend", args.backend, "--batch-sizes", *map(str, args.batch_sizes), "--preprocess-threads", "1"]
+        if args.model:
+            command += ["--model", args.model]
+        if args.random_model:
+            command.append("--random-model")
+        if not args.compiled:
+            command.append("--no-compiled")
+        completed = subprocess.run(command, check=True, capture_output=True, text=True)
+        sweep[f"threads={num_threads}"] = json.loads(completed.stdout)
+    return {"thread_sweep": sweep}
+
+
+def print_summary(results: dict, baseline: dict | None = None) -> None:
+    """Mencetak tabel ringkas ke stderr; jika ada baseline, tampilkan perubahan p50 dan throughput."""
+    for section in ("preprocess", "preprocess_threads", "model"):
+        for name, stats in results.get(section, {}).items():
+            line = (
+                f"{section + '/' + name:<48} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                f"p99 {stats['p99_ms']:8.2f} ms  {stats['images_per_s']:9.1f} img/s"
+            )
+            previous = (baseline or {}).get(section, {}).get(name)
+            if previous:
+                line += (
+                    f"  Δp50 {(stats['p50_ms'] / previous['p50_ms'] - 1):+.1%}"
+                    f"  Δimg/s {(stats['images_per_s'] / previous['images_per_s'] - 1):+.1%}"
+                )
+            print(line, file=sys.stderr)
+    if "metadata" in results:
+        print(f"Puncak RSS: {results['metadata']['peak_rss_mb']:.1f} MB", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark praproses dan inferensi AgroDetect (CPU, offline).")
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, choices=["keras", "tflite", "remote"])
+    parser.add_argument("--model", default=None, help=f"Path model (default {MODEL_PATH} atau sesuai backend).")
+    parser.add_argument("--random-model", action="store_true", help="Pakai model acak berarsitektur sama.")
+    parser.add_argument("--no-compiled", dest="compiled", action="store_false", help="Pakai model.predict biasa.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--preprocess-threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=None, help="Thread intra/inter-op TensorFlow.")
+    parser.add_argument("--thread-sweep", type=int, nargs="+", default=None, help="Jalankan model untuk beberapa jumlah thread TF.")
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--skip-model", action="store_true", help="Hanya benchmark praproses.")
+    parser.add_argument("--output", default="benchmark_results.json", help="File JSON hasil ('-' untuk stdout).")
+    parser.add_argument("--compare", default=None, help="File JSON hasil sebelumnya untuk perbandingan.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    if args.thread_sweep:
+        results.update(run_thread_sweep(args))
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+    else:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        baseline = None
+        if args.compare:
+            with open(args.compare) as baseline_file:
+                baseline = json.load(baseline_file)
+        print_summary(results, baseline)
+        print(f"📄 Hasil disimpan ke {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Konversi `best_model.keras` ke TFLite terkuantisasi dan laporan perbandingannya.
+
+Menghasilkan dua model:
+- `best_model_dynamic.tflite`: kuantisasi dynamic-range (bobot int8, aktivasi float).
+- `best_model_int8.tflite`: kuantisasi int8 penuh, dikalibrasi dari sampel gambar PlantVillage.
+
+Setiap model dibandingkan dengan model Keras pada split validasi yang sama dengan notebook
+(akurasi, latensi per gambar, ukuran file, dan puncak RAM).
+
+Contoh:
+    python convert_tflite.py --data-dir ~/.cache/kagglehub/datasets/arjuntejaswi/plant-village/versions/1/PlantVillage
+    AGRODETECT_BACKEND=tflite streamlit run app.py
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from inference import MODEL_PATH, load_inference_model, measure_latency
+from preprocessing import normalize_pixels
+from training import IMG_SIZE, load_split
+
+OUTPUT_PATHS = {
+    "dynamic": "best_model_dynamic.tflite",
+    "int8": "best_model_int8.tflite",
+}
+# Batas waktu pengukuran puncak RAM di subproses (memuat model + satu prediksi), dalam detik
+PEAK_RSS_TIMEOUT_S = 600
+
+
+def representative_dataset(data_dir: str, num_samples: int, image_size: tuple[int, int] = IMG_SIZE):
+    """Generator sampel kalibrasi dari split training untuk kuantisasi int8 penuh."""
+    dataset = load_split(data_dir, "training", batch_size=1, image_size=image_size).take(num_samples)
+
+    def generator():
+        for images, _ in dataset:
+            yield [normalize_pixels(images.numpy())]
+
+    return generator
+
+
+def convert(model, quantization: str, representative=None) -> bytes:
+    """Mengonversi model Keras ke TFLite dengan input/output tetap float32."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "int8":
+        converter.representative_dataset = representative
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def evaluate_accuracy(predictor, dataset: tf.data.Dataset) -> float:
+    """Menghitung akurasi top-1 secara streaming per batch."""
+    correct = total = 0
+    for images, labels in dataset:
+        predictions = predictor.predict(normalize_pixels(images.numpy()), verbose=0)
+        correct += int(np.sum(np.argmax(predictions, axis=1) == labels.numpy()))
+        total += len(labels)
+    return correct / total if total else 0.0
+
+
+def _peak_rss_worker(backend: str, model_path: str, result_queue) -> None:
+    model = load_inference_model(model_path, backend=backend)
+    model.predict(np.zeros((1,) + tuple(model.input_shape[1:]), dtype=np.float32), verbose=0)
+    result_queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+def measure_peak_rss_mb(backend: str, model_path: str, timeout_s: float = PEAK_RSS_TIMEOUT_S) -> float:
+    """Mengukur puncak RAM (MB) saat memuat dan menjalankan model di proses terpisah.
+
+    Melempar `RuntimeError` jika subproses berhenti tanpa hasil (mis. path model salah atau
+    kehabisan memori) dan `TimeoutError` jika melebihi `timeout_s`.
+    """
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(target=_peak_rss_worker, args=(backend, model_path, result_queue))
+    process.start()
+    deadline = time.monotonic() + timeout_s
+    try:
+        while True:
+            try:
+                return result_queue.get(timeout=1)
+            except queue.Empty:
+                pass
+            if process.exitcode is not None:
+                # Hasil bisa masuk tepat sebelum proses keluar
+                try:
+                    return result_queue.get(timeout=1)
+                except queue.Empty:
+                    raise RuntimeError(
+                        f"Pengukuran RAM {backend} ({model_path}) gagal: subproses keluar dengan kode {process.exitcode}."
+                    ) from None
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Pengukuran RAM {backend} ({model_path}) melebihi batas waktu {timeout_s:.0f} dtk.")
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Konversi model ke TFLite terkuantisasi dan bandingkan dengan model Keras.")
+    parser.add_argument("--data-dir", required=True, help="Folder PlantVillage (berisi subfolder per kelas).")
+    parser.add_argument("--model", default=MODEL_PATH, help="Path model Keras sumber.")
+    parser.add_argument("--calibration-samples", type=int, default=200, help="Jumlah gambar kalibrasi int8.")
+    parser.add_argument("--batch-size", type=int, default=32, help="Ukuran batch untuk evaluasi akurasi.")
+    parser.add_argument("--report", default="tflite_report.json", help="Path laporan JSON.")
+    args = parser.parse_args()
+
+    keras_model = tf.keras.models.load_model(args.model)
+    # Ukuran input mengikuti model sumber (224x224 untuk teacher, lebih kecil untuk model student)
+    image_size = tuple(keras_model.input_shape[1:3])
+    tflite_models = {
+        "dynamic": convert(keras_model, "dynamic"),
+        "int8": convert(keras_model, "int8", representative_dataset(args.data_dir, args.calibration_samples, image_size)),
+    }
+    for quantization, tflite_model in tflite_models.items():
+        with open(OUTPUT_PATHS[quantization], "wb") as tflite_file:
+            tflite_file.write(tflite_model)
+        print(f"✅ Model {quantization} disimpan ke {OUTPUT_PATHS[quantization]}")
+
+    validation_ds = load_split(args.data_dir, "validation", batch_size=args.batch_size, image_size=image_size)
+    candidates = [("keras", args.model)] + [("tflite", path) for path in OUTPUT_PATHS.values()]
+    report = []
+    for backend, model_path in candidates:
+        predictor = load_inference_model(model_path, backend=backend)
+        report.append({
+            "backend": backend,
+            "model_path": model_path,
+            "size_mb": os.path.getsize(model_path) / (1 << 20),
+            "accuracy": evaluate_accuracy(predictor, validation_ds),
+            "latency_ms_per_image": measure_latency(predictor, batch_size=1),
+            "peak_rss_mb": measure_peak_rss_mb(backend, model_path),
+        })
+
+    baseline_accuracy = report[0]["accuracy"]
+    print(f"\n{'Model':<28}{'Ukuran (MB)':>12}{'Akurasi':>10}{'Δ Akurasi':>11}{'ms/gambar':>11}{'RAM (MB)':>10}")
+    for row in report:
+        row["accuracy_delta"] = row["accuracy"] - baseline_accuracy
+        print(
+            f"{row['model_path']:<28}{row['size_mb']:>12.2f}{row['accuracy']:>10.4f}"
+            f"{row['accuracy_delta']:>+11.4f}{row['latency_ms_per_image']:>11.2f}{row['peak_rss_mb']:>10.1f}"
+        )
+    with open(args.report, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"\n📄 Laporan disimpan ke {args.report}")
+
+
+if __name__ == "__main__":
+    main()
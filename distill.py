@@ -0,0 +1,234 @@
+"""Distilasi pengetahuan: melatih model student ringkas dari `best_model.keras` (teacher).
+
+Teacher (MobileNetV2 224x224 + Dense 256) dibekukan; student (default MobileNetV3-Small pada
+160x160) dilatih dengan gabungan:
+- KL divergence terhadap distribusi lunak teacher pada suhu `--temperature`, dan
+- cross-entropy terhadap label asli (bobot `1 - --alpha`).
+
+Kedua model melihat tampilan teraugmentasi yang sama dari cache uint8 `train_full.py`; gambar
+untuk student diubah ukurannya di dalam graf. Student memakai normalisasi yang sama ([-1, 1],
+`include_preprocessing=False` untuk MobileNetV3) dan diakhiri GlobalAveragePooling2D + softmax,
+sehingga aplikasi memuatnya tanpa perubahan:
+
+    AGRODETECT_MODEL=student_model.keras streamlit run app.py
+
+Ukuran input dibaca dari model, jadi praproses aplikasi otomatis mengikuti resolusi student.
+Setelah training dicetak tabel perbandingan akurasi, latensi CPU, dan ukuran teacher vs student
+(juga disimpan ke `distill_report.json`).
+
+Contoh:
+    python distill.py --data-dir /path/ke/PlantVillage --architecture mobilenet_v3_small --img-size 160 --epochs 30
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+from tensorflow.keras.applications import MobileNetV2, MobileNetV3Small
+
+from convert_tflite import evaluate_accuracy, measure_peak_rss_mb
+from inference import MODEL_PATH, load_inference_model, measure_latency, model_input_size
+from train_full import DATASET_CACHE_DIR, cache_split, cached_dataset
+from training import BATCH_SIZE, load_split
+
+STUDENT_MODEL_PATH = "student_model.keras"
+STUDENT_IMG_SIZE = (160, 160)
+TEMPERATURE = 4.0
+# Bobot loss distilasi; sisanya untuk cross-entropy label asli
+DISTILLATION_ALPHA = 0.7
+
+
+# --- Arsitektur Student ---
+def build_student(
+    num_classes: int,
+    architecture: str = "mobilenet_v3_small",
+    img_size: tuple[int, int] = STUDENT_IMG_SIZE,
+    width: float = 1.0,
+    weights: str | None = "imagenet",
+) -> keras.Model:
+    """Backbone ringkas + GlobalAveragePooling2D + Dense logits + softmax (input [-1, 1])."""
+    input_shape = img_size + (3,)
+    if architecture == "mobilenet_v3_small":
+        base_model = MobileNetV3Small(
+            input_shape=input_shape, include_top=False, weights=weights, alpha=width, include_preprocessing=False
+        )
+    elif architecture == "mobilenet_v2":
+        base_model = MobileNetV2(input_shape=input_shape, include_top=False, weights=weights, alpha=width)
+    else:
+        raise ValueError(f"Arsitektur student tidak dikenal: {architecture!r}")
+
+    inputs = keras.Input(shape=input_shape)
+    x = base_model(inputs)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dropout(0.2)(x)
+    logits = layers.Dense(num_classes, dtype="float32", name="logits")(x)
+    outputs = layers.Softmax(dtype="float32")(logits)
+    return keras.Model(inputs, outputs, name=f"student_{architecture}")
+
+
+# --- Distilasi ---
+def distillation_loss(labels, student_logits, teacher_probabilities, temperature: float, alpha: float):
+    """KL(teacher_T || student_T) * T^2 digabung dengan cross-entropy label asli."""
+    teacher_soft = tf.nn.softmax(tf.math.log(teacher_probabilities + 1e-8) / temperature)
+    soft_loss = keras.losses.kl_divergence(teacher_soft, tf.nn.softmax(student_logits / temperature)) * temperature**2
+    hard_loss = keras.losses.sparse_categorical_crossentropy(labels, student_logits, from_logits=True)
+    return tf.reduce_mean(alpha * soft_loss + (1 - alpha) * hard_loss)
+
+
+def distill(
+    teacher: keras.Model,
+    student: keras.Model,
+    train_ds: tf.data.Dataset,
+    val_ds: tf.data.Dataset,
+    epochs: int,
+    learning_rate: float = 5e-4,
+    temperature: float = TEMPERATURE,
+    alpha: float = DISTILLATION_ALPHA,
+    patience: int = 5,
+) -> list[dict]:
+    """Melatih student dari batch float32 0-255 (ukuran teacher); bobot terbaik (akurasi val) dipulihkan."""
+    if epochs < 1:
+        raise ValueError("epochs harus bernilai minimal 1.")
+    teacher.trainable = False
+    logits_model = keras.Model(student.inputs, student.get_layer("logits").output)
+    optimizer = keras.optimizers.Adam(learning_rate)
+    student_size = tuple(student.input_shape[1:3])
+
+    def to_student_input(images):
+        # Antialias mendekati resize BILINEAR Pillow yang dipakai aplikasi saat mengecilkan gambar
+        return tf.image.resize(images, student_size, antialias=True) / 127.5 - 1
+
+    @tf.function
+    def train_step(images, labels):
+        teacher_probabilities = teacher(images / 127.5 - 1, training=False)
+        with tf.GradientTape() as tape:
+            student_logits = logits_model(to_student_input(images), training=True)
+            loss = distillation_loss(labels, student_logits, teacher_probabilities, temperature, alpha)
+        gradients = tape.gradient(loss, logits_model.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, logits_model.trainable_variables))
+        return loss
+
+    @tf.function
+    def correct_predictions(images, labels):
+        predicted = tf.argmax(logits_model(to_student_input(images), training=False), axis=1, output_type=tf.int32)
+        return tf.reduce_sum(tf.cast(predicted == tf.cast(labels, tf.int32), tf.int32))
+
+    history, best_accuracy, best_weights, stale_epochs = [], -1.0, None, 0
+    for epoch in range(epochs):
+        started = time.perf_counter()
+        losses = [float(train_step(images, labels)) for images, labels in train_ds]
+        correct = total = 0
+        for images, labels in val_ds:
+            correct += int(correct_predictions(images, labels))
+            total += int(tf.shape(labels)[0])
+        val_accuracy = correct / max(total, 1)
+        history.append({"epoch": epoch + 1, "loss": float(np.mean(losses)), "val_accuracy": val_accuracy, "seconds": time.perf_counter() - started})
+        print(f"Epoch {epoch + 1}/{epochs}: loss {history[-1]['loss']:.4f}, akurasi val {val_accuracy:.4f} ({history[-1]['seconds']:.1f} dtk)")
+
+        if val_accuracy > best_accuracy:
+            best_accuracy, best_weights, stale_epochs = val_accuracy, student.get_weights(), 0
+        else:
+            stale_epochs += 1
+            if stale_epochs >= patience:
+                break
+    student.set_weights(best_weights)
+    return history
+
+
+# --- Perbandingan Teacher vs Student ---
+def compare_models(data_dir: str, model_paths: dict[str, str], batch_size: int = BATCH_SIZE) -> list[dict]:
+    """Akurasi validasi, latensi CPU per gambar, ukuran file, dan jumlah parameter per model."""
+    report = []
+    for name, model_path in model_paths.items():
+        keras_model = tf.keras.models.load_model(model_path)
+        predictor = load_inference_model(model_path, backend="keras")
+        validation_ds = load_split(data_dir, "validation", batch_size=batch_size, image_size=model_input_size(predictor)[::-1])
+        report.append({
+            "model": name,
+            "model_path": model_path,
+            "input_size": list(model_input_size(predictor)),
+            "parameters": int(keras_model.count_params()),
+            "size_mb": os.path.getsize(model_path) / (1 << 20),
+            "accuracy": evaluate_accuracy(predictor, validation_ds),
+            "latency_ms_per_image": measure_latency(predictor, batch_size=1),
+            "latency_ms_per_image_batch32": measure_latency(predictor, batch_size=32, repeats=10),
+            "peak_rss_mb": measure_peak_rss_mb("keras", model_path),
+        })
+    return report
+
+
+def print_comparison(report: list[dict]) -> None:
+    baseline = report[0]
+    print(f"\n{'Model':<10}{'Input':>10}{'Parameter':>12}{'Ukuran (MB)':>13}{'Akurasi':>10}{'Δ Akurasi':>11}{'ms/gambar':>11}{'ms/gbr b32':>12}{'RAM (MB)':>10}")
+    for row in report:
+        row["accuracy_delta"] = row["accuracy"] - baseline["accuracy"]
+        row["speedup"] = baseline["latency_ms_per_image"] / row["latency_ms_per_image"]
+        print(
+            f"{row['model']:<10}{'x'.join(map(str, row['input_size'])):>10}{row['parameters']:>12,}{row['size_mb']:>13.2f}"
+            f"{row['accuracy']:>10.4f}{row['accuracy_delta']:>+11.4f}{row['latency_ms_per_image']:>11.2f}"
+            f"{row['latency_ms_per_image_batch32']:>12.2f}{row['peak_rss_mb']:>10.1f}"
+        )
+    for row in report[1:]:
+        print(f"Percepatan {row['model']}: {row['speedup']:.2f}x, ukuran {row['size_mb'] / baseline['size_mb']:.0%} dari {baseline['model']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distilasi best_model.keras ke model student ringkas untuk inferensi CPU.")
+    parser.add_argument("--data-dir", required=True, help="Folder PlantVillage (berisi subfolder per kelas).")
+    parser.add_argument("--teacher", default=MODEL_PATH, help="Path model teacher Keras.")
+    parser.add_argument("--architecture", default="mobilenet_v3_small", choices=["mobilenet_v3_small", "mobilenet_v2"])
+    parser.add_argument("--width", type=float, default=1.0, help="Pengali lebar backbone (alpha), mis. 0.75 atau 0.5.")
+    parser.add_argument("--img-size", type=int, default=STUDENT_IMG_SIZE[0], help="Resolusi input student (persegi).")
+    parser.add_argument("--cache-dir", default=DATASET_CACHE_DIR)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--learning-rate", type=float, default=5e-4)
+    parser.add_argument("--temperature", type=float, default=TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=DISTILLATION_ALPHA, help="Bobot loss distilasi (0-1).")
+    parser.add_argument("--output", default=STUDENT_MODEL_PATH)
+    parser.add_argument("--report", default="distill_report.json")
+    args = parser.parse_args()
+    if args.epochs < 1:
+        parser.error("--epochs harus bernilai minimal 1.")
+
+    train_images, train_labels, class_names = cache_split(args.data_dir, "training", args.cache_dir)
+    val_images, val_labels, _ = cache_split(args.data_dir, "validation", args.cache_dir)
+    train_ds = cached_dataset(train_images, train_labels, args.batch_size, augment=True, normalize=False)
+    val_ds = cached_dataset(val_images, val_labels, args.batch_size, normalize=False)
+
+    teacher = tf.keras.models.load_model(args.teacher)
+    student = build_student(len(class_names), args.architecture, (args.img_size, args.img_size), args.width)
+    started = time.perf_counter()
+    history = distill(
+        teacher,
+        student,
+        train_ds,
+        val_ds,
+        epochs=args.epochs,
+        learning_rate=args.learning_rate,
+        temperature=args.temperature,
+        alpha=args.alpha,
+    )
+    print(f"✅ Distilasi selesai dalam {time.perf_counter() - started:.1f} dtk")
+    student.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+    student.save(args.output)
+    print(f"💾 Model student disimpan ke {args.output}")
+
+    report = compare_models(args.data_dir, {"teacher": args.teacher, "student": args.output}, args.batch_size)
+    print_comparison(report)
+    with open(args.report, "w") as report_file:
+        json.dump({
+            "student": {"architecture": args.architecture, "width": args.width, "img_size": args.img_size,
+                        "temperature": args.temperature, "alpha": args.alpha},
+            "history": history,
+            "comparison": report,
+        }, report_file, indent=2)
+    print(f"\n📄 Laporan disimpan ke {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""Indeks embedding daun referensi untuk pencarian kasus serupa dan penolakan out-of-distribution.
+
+Embedding adalah output `GlobalAveragePooling2D` model (dinormalisasi L2, jarak kosinus).
+Indeks disimpan sebagai file .npy yang di-memory-map:
+- `embeddings.npy` (float16) dan `codes_int8.npy` (kuantisasi skalar int8 per dimensi),
+  diurutkan per list IVF sehingga setiap list adalah potongan yang bersebelahan,
+- `labels.npy`, `paths.json`, `class_centroids.npy`, `class_radius.npy`,
+- `ivf_centroids.npy`, `ivf_offsets.npy` untuk pencarian aproksimasi (IVF).
+
+Skor OOD = jarak ke centroid kelas terdekat dibagi "radius" kelas tersebut (persentil
+`OOD_PERCENTILE` jarak gambar training ke centroid-nya); skor > `OOD_MARGIN` dianggap bukan daun
+yang dikenali.
+
+Contoh:
+    python embedding_index.py build --data-dir /path/ke/PlantVillage
+    python embedding_index.py query daun.jpg --k 5
+    python embedding_index.py benchmark --num-references 100000
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+# --- Konfigurasi Indeks ---
+EMBEDDING_INDEX_DIR = os.environ.get("AGRODETECT_EMBEDDING_INDEX", "embedding_index")
+# Persentil jarak training ke centroid kelas yang dipakai sebagai radius kelas
+OOD_PERCENTILE = 99
+# Skor OOD (jarak / radius kelas) di atas nilai ini dianggap out-of-distribution
+OOD_MARGIN = 1.0
+DEFAULT_NPROBE = 16
+# Naikkan bila isi indeks berubah secara tidak kompatibel; indeks lama diabaikan aplikasi
+# (versi 2: referensi diambil dari split training teracak yang sama dengan notebook)
+INDEX_FORMAT_VERSION = 2
+_CHUNK_SIZE = 16384
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normalisasi L2 per baris (float32)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Indeks dan skor k terbesar per baris, terurut menurun (tanpa mengurutkan seluruh baris)."""
+    k = min(k, scores.shape[1])
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return np.take_along_axis(candidate_scores, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+
+def _spherical_kmeans(vectors: np.ndarray, num_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """K-means kosinus sederhana untuk centroid list IVF."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), num_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = np.bincount(assignments, minlength=num_clusters) == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+# --- Pembuatan Indeks ---
+def write_index(
+    index_dir: str,
+    embedding_batches,
+    num_items: int,
+    paths: list[str],
+    num_classes: int,
+    num_lists: int | None = None,
+    seed: int = 0,
+    model_fingerprint: str | None = None,
+) -> None:
+    """Menulis indeks dari iterator `(embeddings, labels)` per batch dengan memori terbatas.
+
+    `model_fingerprint` dicatat di metadata agar aplikasi tidak memakai indeks dari model lain.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    scratch_dir = tempfile.mkdtemp(dir=index_dir)
+    try:
+        # 1. Tulis embedding ternormalisasi (urutan asli) + akumulasi centroid kelas & skala int8
+        unordered = labels = None
+        class_sums = None
+        max_abs = None
+        offset = 0
+        for batch_embeddings, batch_labels in embedding_batches:
+            batch_embeddings = l2_normalize(batch_embeddings)
+            if unordered is None:
+                dimension = batch_embeddings.shape[1]
+                unordered = np.lib.format.open_memmap(os.path.join(scratch_dir, "unordered.npy"), mode="w+", dtype=np.float16, shape=(num_items, dimension))
+                labels = np.empty(num_items, dtype=np.int16)
+                class_sums = np.zeros((num_classes, dimension), dtype=np.float64)
+                max_abs = np.zeros(dimension, dtype=np.float32)
+            count = len(batch_embeddings)
+            unordered[offset:offset + count] = batch_embeddings
+            labels[offset:offset + count] = batch_labels
+            np.add.at(class_sums, np.asarray(batch_labels), batch_embeddings)
+            np.maximum(max_abs, np.abs(batch_embeddings).max(axis=0), out=max_abs)
+            offset += count
+        if offset != num_items:
+            raise ValueError(f"Jumlah embedding ({offset}) tidak sama dengan num_items ({num_items}).")
+        class_centroids = l2_normalize(class_sums)
+
+        # 2. Centroid list IVF dari sampel, lalu tetapkan list setiap embedding
+        num_lists = num_lists or int(min(4096, max(1, 4 * np.sqrt(num_items))))
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(unordered[np.sort(rng.choice(num_items, min(num_items, 50 * num_lists), replace=False))], dtype=np.float32)
+        list_centroids = _spherical_kmeans(sample, min(num_lists, len(sample)), seed=seed)
+        list_ids = np.empty(num_items, dtype=np.int32)
+        class_distances = np.empty(num_items, dtype=np.float32)
+        for start in range(0, num_items, _CHUNK_SIZE):
+            chunk = np.asarray(unordered[start:start + _CHUNK_SIZE], dtype=np.float32)
+            list_ids[start:start + len(chunk)] = np.argmax(chunk @ list_centroids.T, axis=1)
+            chunk_labels = labels[start:start + len(chunk)]
+            class_distances[start:start + len(chunk)] = 1 - np.einsum("ij,ij->i", chunk, class_centroids[chunk_labels])
+
+        # 3. Radius per kelas untuk skor OOD
+        class_radius = np.ones(num_classes, dtype=np.float32)
+        for class_index in range(num_classes):
+            distances = class_distances[labels == class_index]
+            if len(distances):
+                class_radius[class_index] = max(float(np.percentile(distances, OOD_PERCENTILE)), 1e-6)
+
+        # 4. Urutkan ulang per list IVF (float16 + kode int8) agar setiap list bersebelahan di disk
+        order = np.argsort(list_ids, kind="stable")
+        list_offsets = np.searchsorted(list_ids[order], np.arange(len(list_centroids) + 1)).astype(np.int64)
+        code_scale = np.maximum(max_abs, 1e-12) / 127
+        embeddings = np.lib.format.open_memmap(os.path.join(index_dir, "embeddings.npy"), mode="w+", dtype=np.float16, shape=unordered.shape)
+        codes = np.lib.format.open_memmap(os.path.join(index_dir, "codes_int8.npy"), mode="w+", dtype=np.int8, shape=unordered.shape)
+        for start in range(0, num_items, _CHUNK_SIZE):
+            chunk_order = order[start:start + _CHUNK_SIZE]
+            chunk = np.asarray(unordered[np.sort(chunk_order)], dtype=np.float32)[np.argsort(np.argsort(chunk_order))]
+            embeddings[start:start + len(chunk)] = chunk
+            codes[start:start + len(chunk)] = np.clip(np.rint(chunk / code_scale), -127, 127)
+        embeddings.flush()
+        codes.flush()
+        del embeddings, codes, unordered
+
+        np.save(os.path.join(index_dir, "labels.npy"), labels[order])
+        np.save(os.path.join(index_dir, "class_centroids.npy"), class_centroids)
+        np.save(os.path.join(index_dir, "class_radius.npy"), class_radius)
+        np.save(os.path.join(index_dir, "ivf_centroids.npy"), list_centroids)
+        np.save(os.path.join(index_dir, "ivf_offsets.npy"), list_offsets)
+        np.save(os.path.join(index_dir, "code_scale.npy"), code_scale.astype(np.float32))
+        with open(os.path.join(index_dir, "paths.json"), "w") as paths_file:
+            json.dump([paths[i] for i in order], paths_file)
+        with open(os.path.join(index_dir, "metadata.json"), "w") as metadata_file:
+            json.dump({
+                "num_items": num_items,
+                "num_classes": num_classes,
+                "num_lists": len(list_centroids),
+                "dimension": int(code_scale.shape[0]),
+                "model_fingerprint": model_fingerprint,
+                "format_version": INDEX_FORMAT_VERSION,
+            }, metadata_file, indent=2)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+# --- Pencarian ---
+class EmbeddingIndex:
+    """Indeks embedding yang di-memory-map dengan pencarian eksak dan aproksimasi (IVF + int8)."""
+
+    def __init__(self, index_dir: str = EMBEDDING_INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "metadata.json")) as metadata_file:
+            self.metadata = json.load(metadata_file)
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        self.codes = np.load(os.path.join(index_dir, "codes_int8.npy"), mmap_mode="r")
+        self.labels = np.load(os.path.join(index_dir, "labels.npy"), mmap_mode="r")
+        self.class_centroids = np.load(os.path.join(index_dir, "class_centroids.npy"))
+        self.class_radius = np.load(os.path.join(index_dir, "class_radius.npy"))
+        self.list_centroids = np.load(os.path.join(index_dir, "ivf_centroids.npy"))
+        self.list_offsets = np.load(os.path.join(index_dir, "ivf_offsets.npy"))
+        self.code_scale = np.load(os.path.join(index_dir, "code_scale.npy"))
+        with open(os.path.join(index_dir, "paths.json")) as paths_file:
+            self.paths = json.load(paths_file)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def search_exact(self, queries: np.ndarray, k: int = 5) -> tuple[np.ndarray, np.ndarray]:
+        """Pencarian brute-force (kosinus) atas seluruh referensi, per potongan memory-map."""
+        queries = l2_normalize(queries)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_indices = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self), _CHUNK_SIZE):
+            scores = queries @ np.asarray(self.embeddings[start:start + _CHUNK_SIZE], dtype=np.float32).T
+            chunk_scores, chunk_indices = _top_k(scores, k)
+            merged_scores = np.concatenate([best_scores, chunk_scores], axis=1)
+            merged_indices = np.concatenate([best_indices, chunk_indices + start], axis=1)
+            best_scores, order = _top_k(merged_scores, k)
+            best_indices = np.take_along_axis(merged_indices, order, axis=1)
+        return best_scores, best_indices
+
+    def search(self, queries: np.ndarray, k: int = 5, nprobe: int = DEFAULT_NPROBE, rerank: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        """Pencarian aproksimasi: probe `nprobe` list IVF, skor dengan kode int8, lalu rerank float16."""
+        queries = l2_normalize(queries)
+        nprobe = min(nprobe, len(self.list_centroids))
+        probed_lists = np.argpartition(-(queries @ self.list_centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        all_scores, all_indices = [], []
+        for query, lists in zip(queries, probed_lists):
+            candidates = np.concatenate([
+                np.arange(self.list_offsets[list_id], self.list_offsets[list_id + 1]) for list_id in np.sort(lists)
+            ])
+            if len(candidates) == 0:
+                all_scores.append(np.full(k, -np.inf, dtype=np.float32))
+                all_indices.append(np.full(k, -1, dtype=np.int64))
+                continue
+            # Skor kasar dengan kode int8 (query diskalakan agar dot product setara float)
+            coarse = np.asarray(self.codes[candidates], dtype=np.float32) @ (query * self.code_scale)
+            scores, order = _top_k(coarse[np.newaxis], 4 * k if rerank else k)
+            indices = candidates[order[0]]
+            if rerank:
+                shortlist = np.sort(indices)
+                scores, order = _top_k((np.asarray(self.embeddings[shortlist], dtype=np.float32) @ query)[np.newaxis], k)
+                indices = shortlist[order[0]]
+            padding = k - len(indices)
+            all_scores.append(np.pad(scores[0], (0, padding), constant_values=-np.inf))
+            all_indices.append(np.pad(indices, (0, padding), constant_values=-1))
+        return np.stack(all_scores), np.stack(all_indices)
+
+    def ood_scores(self, embeddings: np.ndarray, margin: float = OOD_MARGIN) -> dict:
+        """Skor OOD berbasis jarak kosinus ke centroid kelas terdekat (vektor untuk seluruh batch)."""
+        embeddings = l2_normalize(embeddings)
+        similarities = embeddings @ self.class_centroids.T
+        nearest_classes = np.argmax(similarities, axis=1)
+        distances = 1 - similarities[np.arange(len(embeddings)), nearest_classes]
+        scores = distances / self.class_radius[nearest_classes]
+        return {
+            "nearest_classes": nearest_classes,
+            "distances": distances,
+            "scores": scores,
+            "is_ood": scores > margin,
+        }
+
+
+# --- CLI ---
+def build_from_dataset(args) -> None:
+    from inference import CLASS_NAMES, MODEL_PATH, load_inference_model, model_input_size
+    from prediction_cache import model_fingerprint
+    from preprocessing import normalize_pixels
+    from training import dataset_from_paths, split_file_paths
+
+    model_path = args.model or MODEL_PATH
+    model = load_inference_model(model_path, backend="keras", compiled=True)
+    # Path diambil dari split teracak (semua kelas), lalu dibaca berurutan agar sejajar dengan embedding
+    paths, labels, _ = split_file_paths(args.data_dir, args.subset)
+    dataset = dataset_from_paths(paths, labels, args.batch_size, model_input_size(model)[::-1])
+
+    def embedding_batches():
+        for images, labels in dataset.as_numpy_iterator():
+            _, embeddings = model.predict_with_embeddings(normalize_pixels(images))
+            yield embeddings, labels
+
+    started = time.perf_counter()
+    write_index(
+        args.index_dir,
+        embedding_batches(),
+        len(paths),
+        paths,
+        num_classes=len(CLASS_NAMES),
+        num_lists=args.num_lists,
+        model_fingerprint=model_fingerprint(model_path),
+    )
+    print(f"✅ Indeks {len(paths)} referensi ditulis ke {args.index_dir} dalam {time.perf_counter() - started:.1f} dtk")
+
+
+def query_images(args) -> None:
+    from inference import CLASS_NAMES, load_inference_model, model_input_size
+    from preprocessing import open_image, preprocess_batch
+
+    model = load_inference_model(args.model, backend="keras", compiled=True)
+    index = EmbeddingIndex(args.index_dir)
+    for path in args.images:
+        with open_image(path) as image:
+            _, embeddings = model.predict_with_embeddings(preprocess_batch([image], model_input_size(model)))
+        ood = index.ood_scores(embeddings)
+        scores, indices = index.search(embeddings, k=args.k)
+        status = "OOD" if ood["is_ood"][0] else "OK"
+        print(f"[{status}] {path}: kelas terdekat {CLASS_NAMES[ood['nearest_classes'][0]]}, skor OOD {ood['scores'][0]:.2f}")
+        for score, reference in zip(scores[0], indices[0]):
+            if reference >= 0:
+                print(f"    {score:.3f}  {CLASS_NAMES[index.labels[reference]]:<40} {index.paths[reference]}")
+
+
+def benchmark(args) -> None:
+    """Mengukur latensi query pada referensi sintetis (tanpa model maupun dataset)."""
+    rng = np.random.default_rng(0)
+    num_classes, dimension = 15, 1280
+    class_means = l2_normalize(rng.normal(size=(num_classes, dimension)))
+
+    def synthetic_batches():
+        for start in range(0, args.num_references, 4096):
+            count = min(4096, args.num_references - start)
+            labels = rng.integers(0, num_classes, size=count)
+            yield class_means[labels] + 0.05 * rng.normal(size=(count, dimension)), labels
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        started = time.perf_counter()
+        write_index(index_dir, synthetic_batches(), args.num_references, [""] * args.num_references, num_classes)
+        print(f"Membangun indeks {args.num_references} referensi: {time.perf_counter() - started:.1f} dtk")
+        index = EmbeddingIndex(index_dir)
+        queries = class_means[rng.integers(0, num_classes, size=args.queries)] + 0.05 * rng.normal(size=(args.queries, dimension))
+        for name, search in (
+            ("eksak", lambda query: index.search_exact(query, k=args.k)),
+            (f"IVF+int8 (nprobe={args.nprobe})", lambda query: index.search(query, k=args.k, nprobe=args.nprobe)),
+            ("skor OOD", lambda query: index.ood_scores(query)),
+        ):
+            latencies = []
+            for query in queries:
+                query_started = time.perf_counter()
+                search(query[np.newaxis])
+                latencies.append((time.perf_counter() - query_started) * 1000)
+            print(f"{name:<26} p50 {np.percentile(latencies, 50):8.2f} ms   p99 {np.percentile(latencies, 99):8.2f} ms")
+        exact_indices = index.search_exact(queries, k=args.k)[1]
+        approximate_indices = index.search(queries, k=args.k, nprobe=args.nprobe)[1]
+        recall = np.mean([len(set(a) & set(e)) / args.k for a, e in zip(approximate_indices, exact_indices)])
+        print(f"Recall@{args.k} IVF+int8 vs eksak: {recall:.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Indeks embedding daun referensi AgroDetect.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Bangun indeks dari dataset PlantVillage.")
+    build_parser.add_argument("--data-dir", required=True)
+    build_parser.add_argument("--subset", default="training", choices=["training", "validation"])
+    build_parser.add_argument("--model", default=None)
+    build_parser.add_argument("--index-dir", default=EMBEDDING_INDEX_DIR)
+    build_parser.add_argument("--batch-size", type=int, default=64)
+    build_parser.add_argument("--num-lists", type=int, default=None, help="Jumlah list IVF (default 4*sqrt(N)).")
+    build_parser.set_defaults(handler=build_from_dataset)
+
+    query_parser = subparsers.add_parser("query", help="Cari daun referensi serupa dan skor OOD untuk gambar.")
+    query_parser.add_argument("images", nargs="+")
+    query_parser.add_argument("--model", default=None)
+    query_parser.add_argument("--index-dir", default=EMBEDDING_INDEX_DIR)
+    query_parser.add_argument("--k", type=int, default=5)
+    query_parser.set_defaults(handler=query_images)
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Ukur latensi query pada referensi sintetis.")
+    benchmark_parser.add_argument("--num-references", type=int, default=100_000)
+    benchmark_parser.add_argument("--queries", type=int, default=200)
+    benchmark_parser.add_argument("--k", type=int, default=5)
+    benchmark_parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    benchmark_parser.set_defaults(handler=benchmark)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Evaluasi model secara streaming dengan memori konstan.
+
+Batch validasi dialirkan langsung ke model; yang diakumulasi hanya confusion matrix dan
+histogram 2D (keyakinan teratas x jarak keyakinan) per 1%, bukan seluruh gambar atau prediksi.
+Dari akumulator tersebut dihitung precision/recall/F1 per kelas, distribusi keyakinan & jarak,
+serta sapuan `CONFIDENCE_THRESHOLD` / `CERTAINTY_GAP_THRESHOLD` (cakupan vs. akurasi) untuk
+menyetel logika penolakan di aplikasi.
+
+Contoh:
+    python evaluate.py --data-dir /path/ke/PlantVillage --report evaluasi.json --target-accuracy 0.99
+"""
+import argparse
+import json
+
+import numpy as np
+
+from inference import (
+    CERTAINTY_GAP_THRESHOLD,
+    CLASS_NAMES,
+    CONFIDENCE_THRESHOLD,
+    INFERENCE_BACKEND,
+    load_inference_model,
+    model_input_size,
+    model_path_for_backend,
+    validate_predictions,
+)
+from preprocessing import normalize_pixels
+
+# Histogram keyakinan & jarak per 1% (bin 0..100); ambang bilangan bulat dihitung tepat
+NUM_BINS = 101
+
+
+class StreamingEvaluator:
+    """Akumulator metrik evaluasi yang diperbarui per batch dengan memori konstan."""
+
+    def __init__(self, num_classes: int = len(CLASS_NAMES)):
+        self.num_classes = num_classes
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        # Histogram 2D [bin keyakinan, bin jarak] untuk semua prediksi dan yang benar saja
+        self.joint_total = np.zeros((NUM_BINS, NUM_BINS), dtype=np.int64)
+        self.joint_correct = np.zeros((NUM_BINS, NUM_BINS), dtype=np.int64)
+
+    def update(self, labels: np.ndarray, predictions: np.ndarray) -> None:
+        """Memperbarui akumulator dengan label (N,) dan probabilitas (N, jumlah_kelas)."""
+        labels = np.asarray(labels, dtype=np.int64)
+        validation = validate_predictions(predictions)
+        predicted = validation["top_indices"]
+        np.add.at(self.confusion, (labels, predicted), 1)
+
+        confidence_bins = np.clip(np.floor(validation["top_confidences"]), 0, NUM_BINS - 1).astype(np.int64)
+        gap_bins = np.clip(np.floor(validation["confidence_gaps"]), 0, NUM_BINS - 1).astype(np.int64)
+        np.add.at(self.joint_total, (confidence_bins, gap_bins), 1)
+        correct = predicted == labels
+        np.add.at(self.joint_correct, (confidence_bins[correct], gap_bins[correct]), 1)
+
+    def per_class_metrics(self) -> list[dict]:
+        """Precision, recall, F1, dan support per kelas dari confusion matrix."""
+        true_positive = np.diag(self.confusion).astype(np.float64)
+        predicted_count = self.confusion.sum(axis=0)
+        support = self.confusion.sum(axis=1)
+        precision = np.divide(true_positive, predicted_count, out=np.zeros_like(true_positive), where=predicted_count > 0)
+        recall = np.divide(true_positive, support, out=np.zeros_like(true_positive), where=support > 0)
+        denominator = precision + recall
+        f1 = np.divide(2 * precision * recall, denominator, out=np.zeros_like(true_positive), where=denominator > 0)
+        return [
+            {
+                "class_name": CLASS_NAMES[i] if i < len(CLASS_NAMES) else str(i),
+                "precision": float(precision[i]),
+                "recall": float(recall[i]),
+                "f1": float(f1[i]),
+                "support": int(support[i]),
+            }
+            for i in range(self.num_classes)
+        ]
+
+    def threshold_sweep(self) -> tuple[np.ndarray, np.ndarray]:
+        """Cakupan dan akurasi untuk setiap pasangan ambang (keyakinan >= c, jarak >= g), c, g = 0..100.
+
+        Cakupan = porsi gambar yang diterima; akurasi = akurasi di antara gambar yang diterima.
+        """
+        # Jumlah kumulatif dari pojok kanan-bawah: sel [c, g] = jumlah semua bin keyakinan >= c dan jarak >= g
+        accepted = self.joint_total[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+        accepted_correct = self.joint_correct[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+        total = max(int(self.joint_total.sum()), 1)
+        coverage = accepted / total
+        accuracy = np.divide(accepted_correct, accepted, out=np.zeros(accepted.shape), where=accepted > 0)
+        return coverage, accuracy
+
+    def report(self, target_accuracy: float | None = None, sweep_step: int = 5) -> dict:
+        """Menyusun laporan lengkap (siap disimpan sebagai JSON)."""
+        total = int(self.confusion.sum())
+        coverage, accuracy = self.threshold_sweep()
+        sweep = [
+            {
+                "confidence_threshold": c,
+                "certainty_gap_threshold": g,
+                "coverage": float(coverage[c, g]),
+                "accuracy": float(accuracy[c, g]),
+            }
+            for c in range(0, NUM_BINS, sweep_step)
+            for g in range(0, NUM_BINS, sweep_step)
+        ]
+        current_c, current_g = int(CONFIDENCE_THRESHOLD), int(CERTAINTY_GAP_THRESHOLD)
+        report = {
+            "num_images": total,
+            "accuracy": float(np.trace(self.confusion) / total) if total else 0.0,
+            "per_class": self.per_class_metrics(),
+            "confusion_matrix": self.confusion.tolist(),
+            "confidence_histogram": self.joint_total.sum(axis=1).tolist(),
+            "gap_histogram": self.joint_total.sum(axis=0).tolist(),
+            "current_thresholds": {
+                "confidence_threshold": current_c,
+                "certainty_gap_threshold": current_g,
+                "coverage": float(coverage[current_c, current_g]),
+                "accuracy": float(accuracy[current_c, current_g]),
+            },
+            "threshold_sweep": sweep,
+        }
+        if target_accuracy is not None:
+            # Pasangan ambang dengan cakupan terbesar yang akurasinya memenuhi target
+            feasible = np.where(accuracy >= target_accuracy, coverage, -1.0)
+            c, g = np.unravel_index(np.argmax(feasible), feasible.shape)
+            report["recommended_thresholds"] = None if feasible[c, g] < 0 else {
+                "target_accuracy": target_accuracy,
+                "confidence_threshold": int(c),
+                "certainty_gap_threshold": int(g),
+                "coverage": float(coverage[c, g]),
+                "accuracy": float(accuracy[c, g]),
+            }
+        return report
+
+
+def evaluate(model, dataset, num_classes: int = len(CLASS_NAMES)) -> StreamingEvaluator:
+    """Mengalirkan dataset (batch gambar RGB 0-255, label) ke model dan mengakumulasi metrik."""
+    evaluator = StreamingEvaluator(num_classes)
+    for images, labels in dataset:
+        predictions = model.predict(normalize_pixels(np.asarray(images)), verbose=0)
+        evaluator.update(np.asarray(labels), predictions)
+    return evaluator
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{'Kelas':<40}{'Precision':>10}{'Recall':>10}{'F1':>10}{'Support':>10}")
+    for row in report["per_class"]:
+        print(f"{row['class_name']:<40}{row['precision']:>10.4f}{row['recall']:>10.4f}{row['f1']:>10.4f}{row['support']:>10}")
+    print(f"\nAkurasi keseluruhan: {report['accuracy']:.4f} ({report['num_images']} gambar)")
+    current = report["current_thresholds"]
+    print(
+        f"Ambang aplikasi saat ini (keyakinan >= {current['confidence_threshold']}%, jarak >= {current['certainty_gap_threshold']}%): "
+        f"cakupan {current['coverage']:.2%}, akurasi {current['accuracy']:.2%}"
+    )
+    recommended = report.get("recommended_thresholds")
+    if recommended:
+        print(
+            f"Rekomendasi untuk akurasi >= {recommended['target_accuracy']:.2%}: keyakinan >= {recommended['confidence_threshold']}%, "
+            f"jarak >= {recommended['certainty_gap_threshold']}% (cakupan {recommended['coverage']:.2%}, akurasi {recommended['accuracy']:.2%})"
+        )
+    elif "recommended_thresholds" in report:
+        print("Tidak ada pasangan ambang yang mencapai target akurasi.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluasi streaming model AgroDetect dan sapuan ambang penolakan.")
+    parser.add_argument("--data-dir", required=True, help="Folder dataset (berisi subfolder per kelas).")
+    parser.add_argument("--subset", default="validation", choices=["training", "validation"])
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, choices=["keras", "tflite", "remote"])
+    parser.add_argument("--model", default=None, help="Path model (default sesuai backend).")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--target-accuracy", type=float, default=None, help="Cari ambang dengan cakupan terbesar untuk akurasi ini.")
+    parser.add_argument("--report", default="evaluation_report.json")
+    args = parser.parse_args()
+
+    from training import load_split
+
+    model = load_inference_model(args.model or model_path_for_backend(args.backend), backend=args.backend)
+    dataset = load_split(args.data_dir, args.subset, batch_size=args.batch_size, image_size=model_input_size(model)[::-1])
+    evaluator = evaluate(model, dataset.as_numpy_iterator(), num_classes=len(dataset.class_names))
+    report = evaluator.report(target_accuracy=args.target_accuracy)
+    print_report(report)
+    with open(args.report, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"\n📄 Laporan disimpan ke {args.report}")
+
+
+if __name__ == "__main__":
+    main()
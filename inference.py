@@ -0,0 +1,371 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+
+import numpy as np
+from PIL import Image
+
+import metrics
+from preprocessing import TARGET_SIZE, preprocess_batch
+
+logger = logging.getLogger(__name__)
+# Rincian startup model harus tampil walau aplikasi (mis. `streamlit run`) tidak mengatur logging;
+# root logger bawaan Python hanya meneruskan WARNING ke atas
+if not logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_log_handler)
+    logger.setLevel(os.environ.get("AGRODETECT_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+# --- Path Model ML & Ambang Batas ---
+# Dapat diganti dengan model student hasil distill.py (mis. AGRODETECT_MODEL=student_model.keras)
+MODEL_PATH = os.environ.get("AGRODETECT_MODEL", "best_model.keras")
+# Tingkat keyakinan minimum untuk prediksi utama
+CONFIDENCE_THRESHOLD = 80
+# PERBAIKAN: Jarak minimum antara prediksi teratas dan kedua untuk memastikan model tidak "bingung"
+CERTAINTY_GAP_THRESHOLD = 25
+# Jumlah gambar maksimum per satu forward pass model (mode banyak gambar)
+MAX_BATCH_SIZE = 32
+# Gunakan fungsi inferensi terkompilasi (tf.function) alih-alih model.predict; set "0" untuk perilaku lama
+USE_COMPILED_INFERENCE = os.environ.get("AGRODETECT_COMPILED_INFERENCE", "1") != "0"
+# Kompilasi XLA (jit_compile) untuk fungsi inferensi; aktifkan dengan "1". Nonaktif secara default karena
+# di CPU terukur lebih lambat dari tf.function biasa (bandingkan dengan `python inference.py`)
+XLA_JIT_COMPILE = os.environ.get("AGRODETECT_XLA_JIT", "0") == "1"
+# Backend inferensi: "keras" (float32 penuh), "tflite" (model terkuantisasi dari convert_tflite.py),
+# atau "remote" (inference_server.py; TensorFlow tidak dimuat di proses aplikasi)
+INFERENCE_BACKEND = os.environ.get("AGRODETECT_BACKEND", "keras")
+INFERENCE_SERVER_URL = os.environ.get("AGRODETECT_INFERENCE_SERVER", "http://127.0.0.1:8765")
+TFLITE_MODEL_PATH = os.environ.get("AGRODETECT_TFLITE_MODEL", "best_model_int8.tflite")
+# Jumlah thread interpreter TFLite (None = biarkan TFLite memilih)
+TFLITE_NUM_THREADS = int(os.environ["AGRODETECT_TFLITE_THREADS"]) if os.environ.get("AGRODETECT_TFLITE_THREADS") else None
+
+# --- Daftar Kelas (urutan sesuai output model) ---
+CLASS_NAMES = [
+    "Pepper_bell__Bacterial_spot", "Pepper_bell__healthy", "Potato_Early_blight",
+    "Potato_Late_blight", "Potato_healthy", "Tomato_Bacterial_spot", "Tomato_Early_blight",
+    "Tomato_Late_blight", "Tomato_Leaf_Mold", "Tomato_Septoria_leaf_spot",
+    "Tomato_Spider_mites_Two_spotted_mite", "Tomato_Target_Spot",
+    "Tomato_Tomato_Yellow_Leaf_Curl_Virus", "Tomato_Tomato_mosaic_virus", "Tomato_healthy",
+]
+
+
+# --- Fungsi Praproses Gambar ---
+def model_input_size(model) -> tuple[int, int]:
+    """Ukuran input (lebar, tinggi) yang diharapkan model; TARGET_SIZE jika tidak diketahui."""
+    input_shape = getattr(model, "input_shape", None)
+    if input_shape is None or input_shape[1] is None or input_shape[2] is None:
+        return TARGET_SIZE
+    return int(input_shape[2]), int(input_shape[1])
+
+
+def preprocess_image(_image: Image.Image, target_size: tuple[int, int] = TARGET_SIZE) -> np.ndarray:
+    """Memproses gambar yang diunggah untuk prediksi model (batch float32 berukuran 1)."""
+    return preprocess_batch([_image], target_size)
+
+
+# --- Fungsi Prediksi Batch ---
+def predict_batch(model, batch: np.ndarray, max_batch_size: int = MAX_BATCH_SIZE) -> np.ndarray:
+    """Menjalankan model pada batch gambar, dipotong per `max_batch_size` gambar."""
+    if max_batch_size < 1:
+        raise ValueError("max_batch_size harus bernilai minimal 1.")
+    chunks = [
+        model.predict(batch[start:start + max_batch_size], verbose=0)
+        for start in range(0, len(batch), max_batch_size)
+    ]
+    return np.concatenate(chunks, axis=0)
+
+
+# --- LOGIKA VALIDASI DUA TINGKAT ---
+def validate_predictions(
+    predictions: np.ndarray,
+    confidence_threshold: float = CONFIDENCE_THRESHOLD,
+    certainty_gap_threshold: float = CERTAINTY_GAP_THRESHOLD,
+) -> dict:
+    """Menerapkan validasi keyakinan & jarak keyakinan secara vektor untuk seluruh batch.
+
+    `predictions` berbentuk (N, jumlah_kelas). Nilai keyakinan dikembalikan dalam persen.
+    """
+    predictions = np.atleast_2d(predictions)
+    # 1. Ambil dua prediksi teratas tiap gambar (tanpa mengurutkan seluruh kelas)
+    top_two = np.partition(predictions, -2, axis=1)[:, -2:]
+    top_confidences = top_two[:, 1] * 100
+    second_confidences = top_two[:, 0] * 100
+
+    # 2. Hitung jarak keyakinan
+    confidence_gaps = top_confidences - second_confidences
+
+    # 3. Terapkan validasi
+    is_confident = top_confidences >= confidence_threshold
+    is_certain = confidence_gaps >= certainty_gap_threshold
+
+    return {
+        "top_indices": np.argmax(predictions, axis=1),
+        "top_confidences": top_confidences,
+        "confidence_gaps": confidence_gaps,
+        "accepted": is_confident & is_certain,
+    }
+
+
+# --- Inferensi Terkompilasi ---
+class CompiledPredictor:
+    """Pembungkus model Keras dengan fungsi inferensi bersignature tetap (tf.function).
+
+    `model.predict` membangun data adapter dan callback untuk setiap panggilan, yang mahal untuk
+    batch kecil. Kelas ini memanggil model langsung lewat graf yang sudah ditelusuri sekali,
+    dengan antarmuka `predict` yang sama sehingga bisa dipakai sebagai pengganti model.
+    """
+
+    def __init__(self, model, jit_compile: bool = XLA_JIT_COMPILE):
+        import tensorflow as tf
+
+        self.model = model
+        self.input_shape = model.input_shape
+        self._predict_fn = tf.function(
+            lambda images: model(images, training=False),
+            input_signature=[tf.TensorSpec(shape=(None,) + tuple(self.input_shape[1:]), dtype=tf.float32)],
+            jit_compile=jit_compile,
+        )
+        # Embedding = output GlobalAveragePooling2D, diekspos bersama softmax dalam satu forward pass
+        pooling_layers = [layer for layer in model.layers if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D)]
+        self._predict_with_embeddings_fn = None
+        if pooling_layers:
+            embedding_model = tf.keras.Model(model.inputs, [model.outputs[0], pooling_layers[-1].output])
+            self._predict_with_embeddings_fn = tf.function(
+                lambda images: embedding_model(images, training=False),
+                input_signature=[tf.TensorSpec(shape=(None,) + tuple(self.input_shape[1:]), dtype=tf.float32)],
+                jit_compile=jit_compile,
+            )
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        """Menghasilkan array probabilitas (N, jumlah_kelas) seperti `model.predict`."""
+        batch = np.asarray(batch, dtype=np.float32)
+        return self._predict_fn(batch).numpy()
+
+    def predict_with_embeddings(self, batch: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Menghasilkan probabilitas (N, jumlah_kelas) dan embedding GlobalAveragePooling2D (N, dimensi)."""
+        if self._predict_with_embeddings_fn is None:
+            raise ValueError("Model tidak memiliki layer GlobalAveragePooling2D untuk embedding.")
+        probabilities, embeddings = self._predict_with_embeddings_fn(np.asarray(batch, dtype=np.float32))
+        return probabilities.numpy(), embeddings.numpy()
+
+    def warm_up(self, batch_sizes: tuple[int, ...] = (1,)) -> None:
+        """Menjalankan inferensi dummy agar penelusuran graf tidak dibebankan ke pengguna pertama."""
+        for batch_size in batch_sizes:
+            self.predict(np.zeros((batch_size,) + tuple(self.input_shape[1:]), dtype=np.float32))
+
+
+# --- Inferensi TFLite (Terkuantisasi) ---
+class TFLitePredictor:
+    """Menjalankan model TFLite dengan antarmuka `predict` yang sama seperti model Keras.
+
+    Input dan output tetap float32 (kuantisasi hanya di dalam graf), sehingga logika ambang batas
+    dan tabel probabilitas tidak perlu diubah. Interpreter TFLite tidak thread-safe, jadi setiap
+    panggilan dikunci.
+    """
+
+    def __init__(self, model_path: str = TFLITE_MODEL_PATH, num_threads: int | None = TFLITE_NUM_THREADS):
+        import tensorflow as tf
+
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input_index = self.interpreter.get_input_details()[0]["index"]
+        self._output_index = self.interpreter.get_output_details()[0]["index"]
+        self.input_shape = (None,) + tuple(self.interpreter.get_input_details()[0]["shape"][1:])
+        self._batch_size = int(self.interpreter.get_input_details()[0]["shape"][0])
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        """Menghasilkan array probabilitas (N, jumlah_kelas) seperti `model.predict`."""
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self._input_index, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output_index).copy()
+
+    def warm_up(self, batch_sizes: tuple[int, ...] = (1,)) -> None:
+        """Menjalankan inferensi dummy untuk mengalokasikan tensor sebelum permintaan pertama."""
+        for batch_size in batch_sizes:
+            self.predict(np.zeros((batch_size,) + tuple(self.input_shape[1:]), dtype=np.float32))
+
+
+# --- Inferensi Jarak Jauh (inference_server.py) ---
+class RemotePredictor:
+    """Klien HTTP untuk inference_server.py dengan antarmuka `predict` yang sama seperti model Keras.
+
+    Batch float32 dikirim dalam format .npy; server menggabungkan permintaan dari banyak sesi
+    menjadi micro-batch sebelum menjalankan model.
+    """
+
+    def __init__(self, server_url: str = INFERENCE_SERVER_URL, timeout: float = 30.0):
+        self.server_url = server_url.rstrip("/")
+        self.timeout = timeout
+        self.model_fingerprint = None
+        self.input_shape = None
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        """Menghasilkan array probabilitas (N, jumlah_kelas) dari server inferensi."""
+        payload = io.BytesIO()
+        np.save(payload, np.asarray(batch, dtype=np.float32), allow_pickle=False)
+        request = urllib.request.Request(
+            f"{self.server_url}/predict",
+            data=payload.getvalue(),
+            headers={"Content-Type": "application/x-npy"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return np.load(io.BytesIO(response.read()), allow_pickle=False)
+
+    def warm_up(self, batch_sizes: tuple[int, ...] = (1,)) -> None:
+        """Memastikan server siap dan mengambil sidik jari serta bentuk input model yang dilayani."""
+        with urllib.request.urlopen(f"{self.server_url}/health", timeout=self.timeout) as response:
+            health = json.load(response)
+        self.model_fingerprint = health["model_fingerprint"]
+        self.input_shape = tuple(health.get("input_shape") or (None,) + TARGET_SIZE[::-1] + (3,))
+
+
+def model_path_for_backend(backend: str = INFERENCE_BACKEND) -> str:
+    """Mengembalikan path file model (atau URL server) yang dilayani oleh backend tertentu."""
+    if backend == "remote":
+        return INFERENCE_SERVER_URL
+    return TFLITE_MODEL_PATH if backend == "tflite" else MODEL_PATH
+
+
+def load_inference_model(
+    model_path: str | None = None,
+    compiled: bool = USE_COMPILED_INFERENCE,
+    jit_compile: bool = XLA_JIT_COMPILE,
+    backend: str = INFERENCE_BACKEND,
+    timings: dict | None = None,
+    tf_threads: tuple[int | None, int | None] | None = None,
+):
+    """Memuat model sesuai backend beserta warm-up.
+
+    Backend "keras" mengembalikan CompiledPredictor bila `compiled` aktif (atau model Keras biasa),
+    backend "tflite" mengembalikan TFLitePredictor, dan backend "remote" mengembalikan
+    RemotePredictor (`model_path` berisi URL server). Jika `timings` diberikan, durasi impor
+    TensorFlow, pemuatan model, dan warm-up (detik) dicatat ke dalamnya. `tf_threads`
+    (intra-op, inter-op) diterapkan ke runtime TensorFlow sebelum model dimuat (backend "keras").
+    """
+    if backend not in ("keras", "tflite", "remote"):
+        raise ValueError(f"Backend inferensi tidak dikenal: {backend!r} (pilih 'keras', 'tflite', atau 'remote').")
+    model_path = model_path or model_path_for_backend(backend)
+    timings = {} if timings is None else timings
+
+    started = time.perf_counter()
+    if backend != "remote":
+        import tensorflow as tf
+    timings["import_s"] = time.perf_counter() - started
+    if backend == "keras" and tf_threads is not None:
+        from inference_executor import configure_tf_threads
+
+        configure_tf_threads(*tf_threads)
+
+    started = time.perf_counter()
+    if backend == "tflite":
+        model = TFLitePredictor(model_path)
+    elif backend == "remote":
+        model = RemotePredictor(model_path)
+    else:
+        model = tf.keras.models.load_model(model_path)
+        if compiled:
+            model = CompiledPredictor(model, jit_compile=jit_compile)
+    timings["load_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if hasattr(model, "warm_up"):
+        model.warm_up()
+    else:
+        model.predict(np.zeros((1,) + tuple(model.input_shape[1:]), dtype=np.float32), verbose=0)
+    timings["warmup_s"] = time.perf_counter() - started
+    return model
+
+
+# --- Pemuatan Model di Latar Belakang ---
+class BackgroundModelLoader:
+    """Memuat model di thread latar agar render halaman tidak menunggu impor TensorFlow.
+
+    Status dapat diperiksa lewat `ready`/`error`, dan rincian waktu startup (impor, pemuatan,
+    warm-up) tersedia di `timings` serta dicatat ke log.
+    """
+
+    def __init__(
+        self,
+        model_path: str | None = None,
+        backend: str = INFERENCE_BACKEND,
+        tf_threads: tuple[int | None, int | None] | None = None,
+    ):
+        self.model = None
+        self.error: Exception | None = None
+        self.timings: dict[str, float] = {}
+        self._ready = threading.Event()
+        self._thread = threading.Thread(
+            target=self._load, args=(model_path, backend, tf_threads), name="model-loader", daemon=True
+        )
+        self._thread.start()
+
+    def _load(self, model_path: str | None, backend: str, tf_threads: tuple[int | None, int | None] | None) -> None:
+        started = time.perf_counter()
+        try:
+            self.model = load_inference_model(model_path, backend=backend, timings=self.timings, tf_threads=tf_threads)
+        except Exception as e:
+            self.error = e
+            logger.exception("Model gagal dimuat dari %s", model_path)
+        finally:
+            self.timings["total_s"] = time.perf_counter() - started
+            logger.info(
+                "Startup model (%s): %s",
+                backend,
+                ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in self.timings.items()),
+            )
+            metrics.record_model_load(self.timings)
+            self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        """True jika pemuatan sudah selesai (berhasil maupun gagal)."""
+        return self._ready.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Menunggu pemuatan selesai; mengembalikan False jika `timeout` habis lebih dulu."""
+        return self._ready.wait(timeout)
+
+
+def measure_latency(model, batch_size: int = 1, repeats: int = 50) -> float:
+    """Mengukur rata-rata latensi per gambar (ms) untuk `model.predict` pada batch acak."""
+    batch = np.random.default_rng(0).random((batch_size,) + tuple(model.input_shape[1:]), dtype=np.float32)
+    model.predict(batch, verbose=0)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(batch, verbose=0)
+    return (time.perf_counter() - start) / (repeats * batch_size) * 1000
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bandingkan latensi model.predict dengan inferensi terkompilasi.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Path model Keras.")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    keras_model = tf.keras.models.load_model(args.model)
+    variants = {
+        "model.predict": keras_model,
+        "tf.function": CompiledPredictor(keras_model, jit_compile=False),
+        "tf.function + XLA": CompiledPredictor(keras_model, jit_compile=True),
+    }
+    for name, predictor in variants.items():
+        latency_ms = measure_latency(predictor, batch_size=args.batch_size, repeats=args.repeats)
+        print(f"{name:<20} {latency_ms:8.2f} ms/gambar (batch={args.batch_size})")
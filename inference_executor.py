@@ -0,0 +1,168 @@
+"""Eksekutor inferensi bersama dengan konkurensi terbatas untuk semua sesi Streamlit.
+
+Tanpa eksekutor, setiap sesi memanggil model langsung di thread-nya sendiri dan TensorFlow
+memakai semua core untuk setiap panggilan, sehingga beberapa pengguna sekaligus menyebabkan
+oversubscription thread dan lonjakan latensi ekor. Eksekutor ini:
+- menjalankan paling banyak `INFERENCE_CONCURRENCY` panggilan model bersamaan,
+- mengatur thread intra/inter-op TensorFlow secara eksplisit (core dibagi rata per slot),
+- menolak permintaan baru saat antrean penuh (`ServerBusyError` berisi posisi antrean)
+  alih-alih membuat sesi menggantung, dan melaporkan posisi antrean selama menunggu,
+- membatasi waktu tunggu setiap permintaan (`InferenceTimeoutError`).
+
+Konfigurasi lewat `AGRODETECT_INFERENCE_CONCURRENCY`, `AGRODETECT_INFERENCE_QUEUE_LIMIT`,
+`AGRODETECT_INFERENCE_TIMEOUT_S`, `AGRODETECT_TF_INTRA_OP_THREADS`, dan
+`AGRODETECT_TF_INTER_OP_THREADS`. Uji beban: `python load_test.py`.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Konfigurasi Eksekutor ---
+# Jumlah panggilan model yang boleh berjalan bersamaan
+INFERENCE_CONCURRENCY = int(os.environ.get("AGRODETECT_INFERENCE_CONCURRENCY", "2"))
+# Jumlah permintaan maksimum yang menunggu; di atas ini permintaan langsung ditolak (server sibuk)
+INFERENCE_QUEUE_LIMIT = int(os.environ.get("AGRODETECT_INFERENCE_QUEUE_LIMIT", "16"))
+# Batas waktu satu permintaan (menunggu + berjalan), dalam detik
+INFERENCE_TIMEOUT_S = float(os.environ.get("AGRODETECT_INFERENCE_TIMEOUT_S", "30"))
+# Thread TensorFlow: core dibagi rata antar slot konkurensi agar total thread tidak melebihi core
+TF_INTRA_OP_THREADS = int(
+    os.environ.get("AGRODETECT_TF_INTRA_OP_THREADS") or max(1, (os.cpu_count() or 1) // max(1, INFERENCE_CONCURRENCY))
+)
+TF_INTER_OP_THREADS = int(os.environ.get("AGRODETECT_TF_INTER_OP_THREADS") or 1)
+# Interval pemeriksaan status antrean saat menunggu (detik)
+_POLL_INTERVAL_S = 0.1
+
+
+class ServerBusyError(RuntimeError):
+    """Antrean inferensi penuh; `position` adalah posisi yang akan ditempati permintaan ini."""
+
+    def __init__(self, position: int):
+        super().__init__(f"server busy, queued at position {position}")
+        self.position = position
+
+
+class InferenceTimeoutError(TimeoutError):
+    """Permintaan inferensi melebihi batas waktu (menunggu di antrean + berjalan)."""
+
+
+def configure_tf_threads(intra_op_threads: int | None = TF_INTRA_OP_THREADS, inter_op_threads: int | None = TF_INTER_OP_THREADS) -> bool:
+    """Mengatur thread intra/inter-op TensorFlow; harus dipanggil sebelum runtime TF diinisialisasi.
+
+    Mengembalikan False jika runtime sudah berjalan sehingga pengaturan tidak bisa diterapkan.
+    """
+    import tensorflow as tf
+
+    try:
+        if intra_op_threads is not None:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads is not None:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        logger.warning("Thread TensorFlow tidak dapat diatur (runtime sudah diinisialisasi): %s", e)
+        return False
+    return True
+
+
+class InferenceExecutor:
+    """Antrean FIFO bersama di depan model dengan konkurensi, batas antrean, dan batas waktu."""
+
+    def __init__(
+        self,
+        max_concurrency: int = INFERENCE_CONCURRENCY,
+        max_queue: int = INFERENCE_QUEUE_LIMIT,
+        timeout_s: float = INFERENCE_TIMEOUT_S,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency harus bernilai minimal 1.")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout_s = timeout_s
+        self.rejected = 0
+        self.timed_out = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._waiting: list[int] = []
+        self._running = 0
+        self._next_ticket = 0
+
+    def queue_position(self, ticket: int) -> int:
+        """Posisi tiket di antrean (1 = berikutnya dijalankan), atau 0 jika sudah berjalan/selesai."""
+        with self._lock:
+            try:
+                return self._waiting.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "waiting": len(self._waiting),
+                "running": self._running,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+    def run(self, fn, *args, on_queued=None, timeout_s: float | None = None):
+        """Menjalankan `fn(*args)` di slot inferensi dan mengembalikan hasilnya.
+
+        Jika semua slot terpakai, permintaan menunggu di antrean dan `on_queued(posisi)` dipanggil
+        setiap kali posisinya berubah. Melempar `ServerBusyError` bila antrean penuh dan
+        `InferenceTimeoutError` bila batas waktu terlampaui.
+        """
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        submitted = time.perf_counter()
+        with self._lock:
+            outstanding = self._running + len(self._waiting)
+            if outstanding >= self.max_concurrency + self.max_queue:
+                self.rejected += 1
+                raise ServerBusyError(outstanding - self.max_concurrency + 1)
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._waiting.append(ticket)
+            metrics.set_gauge("agrodetect_inference_queue_depth", len(self._waiting))
+
+        def work():
+            with self._lock:
+                self._waiting.remove(ticket)
+                self._running += 1
+                metrics.set_gauge("agrodetect_inference_queue_depth", len(self._waiting))
+            metrics.observe_stage("queue_wait", time.perf_counter() - submitted)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        future = self._executor.submit(work)
+        deadline = submitted + timeout_s
+        last_position = 0
+        while True:
+            remaining = deadline - time.perf_counter()
+            try:
+                return future.result(timeout=max(0.0, min(_POLL_INTERVAL_S, remaining)))
+            except TimeoutError:
+                # TimeoutError dari `fn` sendiri (mis. socket.timeout) diteruskan apa adanya
+                if future.done():
+                    raise
+            if remaining <= 0:
+                break
+            position = self.queue_position(ticket)
+            if on_queued is not None and position and position != last_position:
+                on_queued(position)
+            last_position = position
+
+        # Permintaan yang belum berjalan dibatalkan; yang sudah berjalan dibiarkan selesai di latar
+        if future.cancel():
+            with self._lock:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                metrics.set_gauge("agrodetect_inference_queue_depth", len(self._waiting))
+        with self._lock:
+            self.timed_out += 1
+        raise InferenceTimeoutError(f"Inferensi melebihi batas waktu {timeout_s:.0f} dtk.")
@@ -0,0 +1,195 @@
+"""Server inferensi lokal dengan micro-batching dinamis.
+
+Server memegang satu salinan model. Permintaan dari banyak sesi Streamlit dimasukkan ke antrean
+asyncio, lalu digabung menjadi satu micro-batch (sampai `--max-batch-size` gambar atau setelah
+`--max-wait-ms` berlalu) sebelum satu forward pass dijalankan.
+
+Endpoint:
+    POST /predict   body .npy float32 (N, tinggi, lebar, 3) -> .npy probabilitas (N, jumlah_kelas)
+    GET  /health    status server, sidik jari model, dan bentuk input model
+    GET  /metrics   kedalaman antrean, distribusi ukuran batch, latensi per permintaan
+
+Contoh:
+    python inference_server.py --port 8765 --max-batch-size 32 --max-wait-ms 10
+    AGRODETECT_BACKEND=remote streamlit run app.py
+"""
+import argparse
+import asyncio
+import io
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tornado.web
+
+from inference import INFERENCE_BACKEND, MAX_BATCH_SIZE, load_inference_model, model_path_for_backend, predict_batch
+from prediction_cache import model_fingerprint
+
+# Jumlah latensi permintaan terakhir yang disimpan untuk menghitung persentil
+LATENCY_WINDOW = 10_000
+
+
+class MicroBatcher:
+    """Mengumpulkan permintaan dari antrean menjadi micro-batch dan menjalankan satu forward pass."""
+
+    def __init__(self, model, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = 10.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.queued_images = 0
+        self.batch_sizes = Counter()
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.total_requests = 0
+        # Permintaan yang tidak muat di micro-batch sebelumnya; menjadi awal batch berikutnya
+        self._held_item = None
+        # Satu thread saja agar forward pass tidak saling berebut core CPU
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    async def submit(self, batch: np.ndarray) -> np.ndarray:
+        """Memasukkan batch ke antrean dan menunggu probabilitasnya."""
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self.queued_images += len(batch)
+        await self.queue.put((batch, future))
+        try:
+            return await future
+        finally:
+            self.total_requests += 1
+            self.latencies_ms.append((time.perf_counter() - started) * 1000)
+
+    async def run(self) -> None:
+        """Loop utama: ambil permintaan pertama, tunggu hingga batch penuh atau batas waktu habis.
+
+        Permintaan yang akan membuat batch melebihi `max_batch_size` ditahan untuk batch berikutnya;
+        hanya permintaan tunggal yang lebih besar dari batas yang dipotong oleh `predict_batch`.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._held_item is not None:
+                items, self._held_item = [self._held_item], None
+            else:
+                items = [await self.queue.get()]
+            num_images = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while num_images < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if num_images + len(item[0]) > self.max_batch_size:
+                    self._held_item = item
+                    break
+                items.append(item)
+                num_images += len(item[0])
+
+            self.queued_images -= num_images
+            try:
+                # Di dalam try: bentuk yang tidak cocok harus sampai ke future, bukan menghentikan loop
+                batch = np.concatenate([item_batch for item_batch, _ in items])
+                predictions = await loop.run_in_executor(
+                    self._executor, predict_batch, self.model, batch, self.max_batch_size
+                )
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            # Dicatat per forward pass yang benar-benar dijalankan
+            for start in range(0, num_images, self.max_batch_size):
+                self.batch_sizes[min(self.max_batch_size, num_images - start)] += 1
+            offset = 0
+            for item_batch, future in items:
+                if not future.done():
+                    future.set_result(predictions[offset:offset + len(item_batch)])
+                offset += len(item_batch)
+
+    def metrics(self) -> dict:
+        """Ringkasan metrik server untuk endpoint /metrics."""
+        latencies = np.array(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        return {
+            "queue_depth_requests": self.queue.qsize() + (self._held_item is not None),
+            "queue_depth_images": self.queued_images,
+            "total_requests": self.total_requests,
+            "batch_size_distribution": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "latency_ms": {
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "p99": float(np.percentile(latencies, 99)),
+                "max": float(latencies.max()),
+            },
+        }
+
+
+class PredictHandler(tornado.web.RequestHandler):
+    def initialize(self, batcher: MicroBatcher, input_shape: tuple):
+        self.batcher = batcher
+        self.input_shape = input_shape
+
+    async def post(self):
+        try:
+            batch = np.load(io.BytesIO(self.request.body), allow_pickle=False)
+        except ValueError as e:
+            raise tornado.web.HTTPError(400, reason=f"Body bukan array .npy yang valid: {e}")
+        if batch.ndim != 4 or len(batch) == 0:
+            raise tornado.web.HTTPError(400, reason=f"Bentuk batch tidak valid: {batch.shape}")
+        if tuple(batch.shape[1:]) != tuple(self.input_shape[1:]):
+            raise tornado.web.HTTPError(400, reason=f"Bentuk gambar {batch.shape[1:]} tidak sesuai input model {tuple(self.input_shape[1:])}")
+        predictions = await self.batcher.submit(batch.astype(np.float32, copy=False))
+        payload = io.BytesIO()
+        np.save(payload, predictions, allow_pickle=False)
+        self.set_header("Content-Type", "application/x-npy")
+        self.write(payload.getvalue())
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    def initialize(self, fingerprint: str, input_shape: tuple):
+        self.fingerprint = fingerprint
+        self.input_shape = input_shape
+
+    def get(self):
+        self.write({"status": "ok", "model_fingerprint": self.fingerprint, "input_shape": list(self.input_shape)})
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def initialize(self, batcher: MicroBatcher):
+        self.batcher = batcher
+
+    def get(self):
+        self.write(self.batcher.metrics())
+
+
+async def serve(args) -> None:
+    model_path = args.model or model_path_for_backend(args.backend)
+    model = load_inference_model(model_path, backend=args.backend)
+    batcher = MicroBatcher(model, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    application = tornado.web.Application([
+        (r"/predict", PredictHandler, {"batcher": batcher, "input_shape": tuple(model.input_shape)}),
+        (r"/health", HealthHandler, {"fingerprint": model_fingerprint(model_path), "input_shape": tuple(model.input_shape)}),
+        (r"/metrics", MetricsHandler, {"batcher": batcher}),
+    ])
+    application.listen(args.port, address=args.host, max_body_size=args.max_body_mb << 20)
+    print(f"🚀 Server inferensi berjalan di http://{args.host}:{args.port} (model: {model_path})")
+    await batcher.run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Server inferensi lokal AgroDetect dengan micro-batching dinamis.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--backend", default="keras" if INFERENCE_BACKEND == "remote" else INFERENCE_BACKEND, choices=["keras", "tflite"])
+    parser.add_argument("--model", default=None, help="Path model (default sesuai backend).")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="Waktu tunggu maksimum untuk mengisi micro-batch.")
+    parser.add_argument("--max-body-mb", type=int, default=256, help="Ukuran body permintaan maksimum (MB).")
+    args = parser.parse_args()
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Uji beban inferensi: banyak sesi bersamaan, tanpa vs dengan eksekutor inferensi bersama.
+
+Setiap sesi disimulasikan sebagai thread yang berulang kali mengirim satu gambar (batch 1) ke
+model dengan jeda "berpikir" acak, seperti pengguna Streamlit yang menekan tombol analisis:
+- `direct` (sebelum): setiap sesi memanggil `model.predict` langsung dengan thread pool bawaan
+  TensorFlow, seperti app.py sebelum ada eksekutor.
+- `executor` (sesudah): semua sesi lewat `InferenceExecutor` dengan konkurensi terbatas dan
+  thread intra/inter-op TensorFlow yang diatur eksplisit.
+
+Thread TensorFlow hanya bisa diatur sebelum runtime diinisialisasi, jadi setiap mode dijalankan
+di subproses terpisah. Latensi yang dilaporkan adalah end-to-end dari sisi sesi (termasuk
+menunggu di antrean); permintaan yang ditolak (server sibuk) atau melebihi batas waktu dihitung
+terpisah.
+
+Contoh:
+    python load_test.py --sessions 10 --requests-per-session 20 --output load_test.json
+    python load_test.py --random-model --sessions 16 --concurrency 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from benchmark import load_benchmark_model, peak_rss_mb, summarize
+from inference import INFERENCE_BACKEND, MODEL_PATH
+from inference_executor import (
+    INFERENCE_CONCURRENCY,
+    INFERENCE_QUEUE_LIMIT,
+    INFERENCE_TIMEOUT_S,
+    InferenceExecutor,
+    InferenceTimeoutError,
+    ServerBusyError,
+    configure_tf_threads,
+)
+
+MODES = ("direct", "executor")
+
+
+def simulate_sessions(predict, input_shape: tuple, args) -> dict:
+    """Menjalankan `args.sessions` sesi bersamaan dan mengumpulkan latensi serta penolakan."""
+    latencies, outcomes = [], {"ok": 0, "busy": 0, "timeout": 0}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(args.sessions)
+
+    def session(session_index: int) -> None:
+        rng = np.random.default_rng(session_index)
+        batch = rng.uniform(-1, 1, size=(1,) + input_shape).astype(np.float32)
+        start_barrier.wait()
+        for _ in range(args.requests_per_session):
+            time.sleep(rng.uniform(0, 2 * args.think_ms) / 1000)
+            started = time.perf_counter()
+            try:
+                predict(batch)
+                outcome = "ok"
+            except ServerBusyError:
+                outcome = "busy"
+            except InferenceTimeoutError:
+                outcome = "timeout"
+            with lock:
+                outcomes[outcome] += 1
+                if outcome == "ok":
+                    latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_s = time.perf_counter() - started
+
+    stats = summarize(latencies) if latencies else {}
+    stats.update(outcomes)
+    stats["throughput_per_s"] = outcomes["ok"] / wall_s
+    stats["wall_s"] = wall_s
+    return stats
+
+
+def run_mode(args) -> dict:
+    """Menjalankan satu mode di proses ini (dipanggil dari subproses)."""
+    if args.mode == "executor":
+        configure_tf_threads(args.intra_op_threads, args.inter_op_threads)
+    model, model_source = load_benchmark_model(args)
+    input_shape = tuple(model.input_shape[1:])
+    model.predict(np.zeros((1,) + input_shape, dtype=np.float32), verbose=0)
+
+    if args.mode == "executor":
+        executor = InferenceExecutor(args.concurrency, args.queue_limit, args.timeout)
+
+        def predict(batch):
+            return executor.run(model.predict, batch)
+    else:
+
+        def predict(batch):
+            return model.predict(batch, verbose=0)
+
+    stats = simulate_sessions(predict, input_shape, args)
+    stats["peak_rss_mb"] = peak_rss_mb()
+    return {
+        "mode": args.mode,
+        "model": model_source,
+        "sessions": args.sessions,
+        "requests_per_session": args.requests_per_session,
+        "concurrency": args.concurrency if args.mode == "executor" else None,
+        "tf_threads": [args.intra_op_threads, args.inter_op_threads] if args.mode == "executor" else "default",
+        **stats,
+    }
+
+
+def run_all_modes(args) -> list[dict]:
+    """Menjalankan setiap mode di subproses baru agar pengaturan thread TF tidak saling memengaruhi."""
+    results = []
+    for mode in MODES:
+        command = [
+            sys.executable, __file__, "--mode", mode, "--output", "-",
+            "--sessions", str(args.sessions), "--requests-per-session", str(args.requests_per_session),
+            "--think-ms", str(args.think_ms), "--concurrency", str(args.concurrency),
+            "--intra-op-threads", str(args.intra_op_threads), "--inter-op-threads", str(args.inter_op_threads),
+            "--queue-limit", str(args.queue_limit), "--timeout", str(args.timeout), "--backend", args.backend,
+        ]
+        if args.model:
+            command += ["--model", args.model]
+        if args.random_model:
+            command.append("--random-model")
+        if not args.compiled:
+            command.append("--no-compiled")
+        completed = subprocess.run(command, check=True, capture_output=True, text=True)
+        results.append(json.loads(completed.stdout))
+    return results
+
+
+def print_comparison(results: list[dict]) -> None:
+    print(f"\n{'Mode':<10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'req/dtk':>9}{'OK':>6}{'Sibuk':>7}{'Timeout':>9}{'RSS (MB)':>10}")
+    for row in results:
+        print(
+            f"{row['mode']:<10}{row.get('p50_ms', float('nan')):>10.1f}{row.get('p95_ms', float('nan')):>10.1f}"
+            f"{row.get('p99_ms', float('nan')):>10.1f}{row['throughput_per_s']:>9.1f}{row['ok']:>6}{row['busy']:>7}"
+            f"{row['timeout']:>9}{row['peak_rss_mb']:>10.1f}"
+        )
+    before, after = results[0], results[-1]
+    if "p99_ms" in before and "p99_ms" in after:
+        print(f"p99 {before['mode']} -> {after['mode']}: {before['p99_ms']:.1f} ms -> {after['p99_ms']:.1f} ms ({after['p99_ms'] / before['p99_ms'] - 1:+.1%})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Uji beban inferensi AgroDetect dengan banyak sesi bersamaan.")
+    parser.add_argument("--mode", choices=MODES, default=None, help="Jalankan satu mode saja (default: bandingkan semua).")
+    parser.add_argument("--sessions", type=int, default=10, help="Jumlah sesi pengguna bersamaan.")
+    parser.add_argument("--requests-per-session", type=int, default=20)
+    parser.add_argument("--think-ms", type=float, default=200, help="Rata-rata jeda antar-permintaan per sesi (ms).")
+    parser.add_argument("--concurrency", type=int, default=INFERENCE_CONCURRENCY)
+    parser.add_argument("--intra-op-threads", type=int, default=None, help="Default: core dibagi rata per slot konkurensi.")
+    parser.add_argument("--inter-op-threads", type=int, default=1)
+    parser.add_argument("--queue-limit", type=int, default=INFERENCE_QUEUE_LIMIT)
+    parser.add_argument("--timeout", type=float, default=INFERENCE_TIMEOUT_S)
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, choices=["keras", "tflite"])
+    parser.add_argument("--model", default=None, help=f"Path model (default {MODEL_PATH} atau sesuai backend).")
+    parser.add_argument("--random-model", action="store_true", help="Pakai model acak berarsitektur sama.")
+    parser.add_argument("--no-compiled", dest="compiled", action="store_false", help="Pakai model.predict biasa.")
+    parser.add_argument("--output", default="load_test_results.json", help="File JSON hasil ('-' untuk stdout).")
+    args = parser.parse_args()
+    if args.intra_op_threads is None:
+        args.intra_op_threads = max(1, (os.cpu_count() or 1) // args.concurrency)
+
+    if args.mode:
+        results = [run_mode(args)]
+    else:
+        results = run_all_modes(args)
+
+    if args.output == "-":
+        json.dump(results[0] if args.mode else results, sys.stdout, indent=2)
+        return
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print_comparison(results)
+    print(f"📄 Hasil disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
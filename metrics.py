@@ -0,0 +1,186 @@
+"""Instrumentasi ringan untuk jalur analisis AgroDetect dengan ekspor format teks Prometheus.
+
+Metrik yang dicatat:
+- `agrodetect_stage_seconds{stage=...}`: histogram durasi tiap tahap (decode, preprocess,
+  inference, validation, render = eksekusi skrip di luar blok analisis).
+- `agrodetect_predictions_total{class_name=..., outcome="accepted"|"rejected"}`: jumlah prediksi
+  yang diterima / ditolak ambang batas per kelas.
+- `agrodetect_model_load_seconds{stage=...}`: rincian waktu startup model (impor, muat, warm-up).
+- `agrodetect_prediction_cache_*`: statistik cache prediksi.
+
+Dinonaktifkan secara default; aktifkan dengan `AGRODETECT_METRICS=1`. Saat nonaktif, `timer()`
+mengembalikan context manager kosong yang sama dan pencatatan lain langsung kembali, sehingga
+overhead-nya dapat diabaikan. Ekspor lewat endpoint HTTP lokal (`AGRODETECT_METRICS_PORT`,
+default 9108) dan/atau file (`AGRODETECT_METRICS_FILE`, ditulis ulang berkala).
+"""
+import contextlib
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# --- Konfigurasi Metrik ---
+METRICS_ENABLED = os.environ.get("AGRODETECT_METRICS", "0") == "1"
+METRICS_HOST = os.environ.get("AGRODETECT_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("AGRODETECT_METRICS_PORT", "9108"))
+METRICS_FILE = os.environ.get("AGRODETECT_METRICS_FILE") or None
+METRICS_FILE_INTERVAL_S = 15
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_TIMER = contextlib.nullcontext()
+_lock = threading.Lock()
+_stage_buckets: dict[str, list[int]] = {}
+_stage_sums: dict[str, float] = {}
+_stage_counts: dict[str, int] = {}
+_prediction_counts: dict[tuple[str, str], int] = {}
+_model_load_seconds: dict[str, float] = {}
+_gauges: dict[str, float] = {}
+
+
+# --- Pencatatan ---
+def observe_stage(stage: str, seconds: float) -> None:
+    """Mencatat durasi satu tahap ke histogram."""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        buckets = _stage_buckets.setdefault(stage, [0] * (len(STAGE_BUCKETS) + 1))
+        buckets[bisect_left(STAGE_BUCKETS, seconds)] += 1
+        _stage_sums[stage] = _stage_sums.get(stage, 0.0) + seconds
+        _stage_counts[stage] = _stage_counts.get(stage, 0) + 1
+
+
+class _StageTimer:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe_stage(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def timer(stage: str):
+    """Context manager pengukur durasi tahap; tanpa biaya berarti bila metrik nonaktif."""
+    return _StageTimer(stage) if METRICS_ENABLED else _NULL_TIMER
+
+
+def count_predictions(class_names, accepted) -> None:
+    """Menambah penghitung prediksi diterima/ditolak per kelas (iterable sejajar)."""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        for class_name, is_accepted in zip(class_names, accepted):
+            key = (class_name, "accepted" if is_accepted else "rejected")
+            _prediction_counts[key] = _prediction_counts.get(key, 0) + 1
+
+
+def record_model_load(timings: dict[str, float]) -> None:
+    """Menyimpan rincian waktu startup model (kunci seperti `import_s`, `load_s`, `warmup_s`)."""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        for stage, seconds in timings.items():
+            _model_load_seconds[stage.removesuffix("_s")] = seconds
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Mengatur nilai gauge bebas (mis. statistik cache prediksi)."""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+
+
+# --- Ekspor Prometheus ---
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    """Menyusun seluruh metrik dalam format teks eksposisi Prometheus."""
+    lines = []
+    with _lock:
+        lines += [
+            "# HELP agrodetect_stage_seconds Durasi tahap analisis (render = satu eksekusi skrip Streamlit di luar tahap analisis).",
+            "# TYPE agrodetect_stage_seconds histogram",
+        ]
+        for stage, buckets in sorted(_stage_buckets.items()):
+            cumulative = 0
+            for upper_bound, count in zip(STAGE_BUCKETS, buckets):
+                cumulative += count
+                lines.append(f'agrodetect_stage_seconds_bucket{{stage="{_escape(stage)}",le="{upper_bound}"}} {cumulative}')
+            lines.append(f'agrodetect_stage_seconds_bucket{{stage="{_escape(stage)}",le="+Inf"}} {_stage_counts[stage]}')
+            lines.append(f'agrodetect_stage_seconds_sum{{stage="{_escape(stage)}"}} {_stage_sums[stage]}')
+            lines.append(f'agrodetect_stage_seconds_count{{stage="{_escape(stage)}"}} {_stage_counts[stage]}')
+
+        lines += [
+            "# HELP agrodetect_predictions_total Prediksi yang diterima atau ditolak ambang batas, per kelas teratas.",
+            "# TYPE agrodetect_predictions_total counter",
+        ]
+        for (class_name, outcome), count in sorted(_prediction_counts.items()):
+            lines.append(f'agrodetect_predictions_total{{class_name="{_escape(class_name)}",outcome="{outcome}"}} {count}')
+
+        lines += [
+            "# HELP agrodetect_model_load_seconds Rincian waktu startup model.",
+            "# TYPE agrodetect_model_load_seconds gauge",
+        ]
+        for stage, seconds in sorted(_model_load_seconds.items()):
+            lines.append(f'agrodetect_model_load_seconds{{stage="{_escape(stage)}"}} {seconds}')
+
+        for name, value in sorted(_gauges.items()):
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        payload = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _write_metrics_file_forever(path: str) -> None:
+    while True:
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as metrics_file:
+            metrics_file.write(render_prometheus())
+        os.replace(temporary_path, path)
+        time.sleep(METRICS_FILE_INTERVAL_S)
+
+
+def start_exporter(port: int | None = METRICS_PORT, metrics_file: str | None = METRICS_FILE) -> bool:
+    """Menjalankan endpoint `/metrics` dan/atau penulis file di thread latar (sekali per proses).
+
+    Mengembalikan False jika metrik nonaktif.
+    """
+    if not METRICS_ENABLED:
+        return False
+    if port:
+        try:
+            server = ThreadingHTTPServer((METRICS_HOST, port), _MetricsHandler)
+        except OSError as e:
+            # Mis. port sudah dipakai proses lain; aplikasi tetap berjalan tanpa endpoint HTTP
+            logger.warning("Endpoint metrik tidak dapat dijalankan di %s:%s: %s", METRICS_HOST, port, e)
+        else:
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    if metrics_file:
+        threading.Thread(target=_write_metrics_file_forever, args=(metrics_file,), name="metrics-file", daemon=True).start()
+    return True
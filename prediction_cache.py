@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# --- Konfigurasi Cache Prediksi ---
+# Jumlah vektor probabilitas maksimum yang disimpan sebelum entri terlama dibuang (LRU)
+PREDICTION_CACHE_SIZE = 2048
+# Folder penyimpanan cache di disk agar bertahan setelah restart (None = hanya di memori)
+PREDICTION_CACHE_DIR = os.environ.get("AGRODETECT_PREDICTION_CACHE_DIR") or None
+
+
+def model_fingerprint(model_path: str) -> str:
+    """Menghitung sidik jari (SHA-256) file model agar cache otomatis tidak berlaku saat model diganti."""
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as model_file:
+        for block in iter(lambda: model_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Cache vektor probabilitas berbasis hash isi gambar, dibagi antar sesi (thread-safe).
+
+    Kunci cache adalah SHA-256 dari byte gambar yang diunggah digabung dengan sidik jari model,
+    sehingga gambar yang sama tidak perlu didekode dan diprediksi ulang.
+    """
+
+    def __init__(self, model_fingerprint: str, max_size: int = PREDICTION_CACHE_SIZE, cache_dir: str | None = PREDICTION_CACHE_DIR):
+        if max_size < 1:
+            raise ValueError("max_size harus bernilai minimal 1.")
+        self.model_fingerprint = model_fingerprint
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_from_disk()
+
+    def make_key(self, image_bytes: bytes) -> str:
+        """Membuat kunci cache dari byte gambar dan sidik jari model."""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(self.model_fingerprint.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> np.ndarray | None:
+        """Mengambil vektor probabilitas dari cache, atau None jika belum ada."""
+        with self._lock:
+            predictions = self._entries.get(key)
+            if predictions is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return predictions
+
+    def put(self, key: str, predictions: np.ndarray) -> None:
+        """Menyimpan vektor probabilitas dan membuang entri yang paling lama tidak dipakai."""
+        predictions = np.array(predictions, dtype=np.float32)
+        predictions.setflags(write=False)
+        with self._lock:
+            self._entries[key] = predictions
+            self._entries.move_to_end(key)
+            evicted_keys = []
+            while len(self._entries) > self.max_size:
+                evicted_key, _ = self._entries.popitem(last=False)
+                evicted_keys.append(evicted_key)
+        if self.cache_dir:
+            np.save(self._entry_path(key), predictions)
+            for evicted_key in evicted_keys:
+                try:
+                    os.remove(self._entry_path(evicted_key))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        """Mengembalikan statistik cache (hit, miss, rasio hit, ukuran) untuk pemantauan."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _load_from_disk(self) -> None:
+        """Memuat entri cache dari disk, yang paling baru dipakai dimuat terakhir."""
+        entry_files = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(".npy")
+        ]
+        entry_files.sort(key=os.path.getmtime)
+        for stale_file in entry_files[:-self.max_size]:
+            os.remove(stale_file)
+        for entry_file in entry_files[-self.max_size:]:
+            try:
+                predictions = np.load(entry_file)
+            except (OSError, ValueError):
+                os.remove(entry_file)
+                continue
+            predictions.setflags(write=False)
+            self._entries[os.path.basename(entry_file)[:-len(".npy")]] = predictions
@@ -0,0 +1,124 @@
+"""Praproses gambar yang cepat dan hemat memori untuk input model MobileNetV2.
+
+- Foto besar (mis. kamera ponsel 12 MP) didekode langsung pada skala kecil lewat draft mode JPEG.
+- Orientasi EXIF diterapkan sehingga foto potret tidak masuk model dalam posisi miring.
+- Hasil ditulis langsung ke buffer batch float32 yang sudah dialokasikan, tanpa salinan perantara.
+- Unggahan patologis (decompression bomb) ditolak dari header sebelum piksel didekode.
+- Normalisasi identik dengan `mobilenet_v2.preprocess_input` yang dipakai saat training.
+
+Pemeriksaan paritas terhadap pipeline training (membutuhkan TensorFlow):
+    python preprocessing.py path/ke/daun.jpg
+"""
+import numpy as np
+from PIL import Image, ImageOps
+
+# --- Konfigurasi Praproses ---
+TARGET_SIZE = (224, 224)
+# Ukuran maksimum (lebar, tinggi) salinan gambar yang ditampilkan di halaman
+DISPLAY_MAX_SIZE = (720, 720)
+# Batas jumlah piksel gambar sumber; di atas ini unggahan ditolak sebelum didekode (~50 MP)
+MAX_IMAGE_PIXELS = 50_000_000
+# Versi praproses; ikut masuk kunci cache prediksi agar hasil lama tidak terpakai saat praproses berubah
+PREPROCESSING_VERSION = "mobilenet_v2-draft-exif-1"
+
+# Skala normalisasi mobilenet_v2.preprocess_input: x / 127.5 - 1 (rentang [-1, 1])
+_PIXEL_SCALE = np.float32(1 / 127.5)
+
+
+class ImageTooLargeError(ValueError):
+    """Dimensi gambar melebihi MAX_IMAGE_PIXELS (kemungkinan decompression bomb)."""
+
+
+def open_image(source, max_pixels: int = MAX_IMAGE_PIXELS) -> Image.Image:
+    """Membuka gambar tanpa mendekode piksel dan menolak dimensi yang tidak wajar."""
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+    if image.width * image.height > max_pixels:
+        image.close()
+        raise ImageTooLargeError(
+            f"Gambar terlalu besar ({image.width}x{image.height} piksel, batas {max_pixels:,} piksel)."
+        )
+    return image
+
+
+def prepare_image(image: Image.Image, target_size: tuple[int, int] = TARGET_SIZE) -> Image.Image:
+    """Mendekode gambar pada skala terkecil yang cukup, menerapkan EXIF, lalu mengubah ukuran ke `target_size`."""
+    if image.format == "JPEG" and image.width >= 2 * target_size[0] and image.height >= 2 * target_size[1]:
+        # Draft mode hanya berlaku sebelum piksel dimuat; decoder JPEG langsung mengecilkan 1/2, 1/4, atau 1/8
+        image.draft("RGB", target_size)
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size != target_size:
+        image = image.resize(target_size, Image.Resampling.BILINEAR)
+    return image
+
+
+def thumbnail_image(image: Image.Image, max_size: tuple[int, int] = DISPLAY_MAX_SIZE) -> Image.Image:
+    """Salinan kecil untuk ditampilkan, didekode lewat draft mode JPEG, dengan orientasi EXIF diterapkan.
+
+    `image` diperkecil di tempat; pakai handle terpisah dari yang dipakai untuk prediksi.
+    """
+    # reducing_gap=1: draft mode memilih skala JPEG terkecil yang masih >= max_size
+    image.thumbnail(max_size, Image.Resampling.BILINEAR, reducing_gap=1.0)
+    return ImageOps.exif_transpose(image)
+
+
+def normalize_pixels(pixels: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """Menormalkan piksel RGB 0-255 ke [-1, 1] seperti `mobilenet_v2.preprocess_input` (float32)."""
+    out = np.multiply(pixels, _PIXEL_SCALE, out=out, dtype=np.float32)
+    out -= 1
+    return out
+
+
+def preprocess_into(image: Image.Image, out: np.ndarray) -> np.ndarray:
+    """Memproses satu gambar langsung ke slot buffer float32 `out` berbentuk (tinggi, lebar, 3)."""
+    height, width = out.shape[:2]
+    prepared = prepare_image(image, (width, height))
+    return normalize_pixels(np.asarray(prepared), out=out)
+
+
+def preprocess_batch(images, target_size: tuple[int, int] = TARGET_SIZE) -> np.ndarray:
+    """Memproses beberapa gambar ke satu buffer batch float32 (N, tinggi, lebar, 3)."""
+    images = list(images)
+    batch = np.empty((len(images), target_size[1], target_size[0], 3), dtype=np.float32)
+    for i, image in enumerate(images):
+        preprocess_into(image, batch[i])
+    return batch
+
+
+# --- Pemeriksaan Paritas dengan Pipeline Training ---
+def check_training_parity(image_path: str) -> dict:
+    """Membandingkan praproses ini dengan pipeline notebook (decode + resize TF + preprocess_input).
+
+    Normalisasi harus identik (selisih ~0); selisih end-to-end berasal dari perbedaan resize
+    Pillow vs `tf.image.resize` dan draft mode, dan dilaporkan sebagai informasi.
+    """
+    import tensorflow as tf
+    from tensorflow.keras.applications import mobilenet_v2
+
+    with open_image(image_path) as image:
+        resized = np.asarray(prepare_image(image))
+    normalization_diff = np.abs(normalize_pixels(resized) - mobilenet_v2.preprocess_input(resized.astype(np.float32)))
+
+    with open_image(image_path) as image:
+        ours = preprocess_batch([image])[0]
+    raw = tf.io.decode_image(tf.io.read_file(image_path), channels=3, expand_animations=False)
+    training = mobilenet_v2.preprocess_input(tf.image.resize(raw, TARGET_SIZE).numpy())
+    end_to_end_diff = np.abs(ours - training)
+    return {
+        "normalization_max_abs_diff": float(normalization_diff.max()),
+        "end_to_end_mean_abs_diff": float(end_to_end_diff.mean()),
+        "end_to_end_max_abs_diff": float(end_to_end_diff.max()),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        parity = check_training_parity(path)
+        status = "OK" if parity["normalization_max_abs_diff"] < 1e-6 else "BEDA"
+        print(f"[{status}] {path}: " + ", ".join(f"{key}={value:.6f}" for key, value in parity.items()))
@@ -0,0 +1,46 @@
+import numpy as np
+
+from evaluate import NUM_BINS, StreamingEvaluator
+from inference import validate_predictions
+
+
+def _random_batches(num_classes: int = 15, num_batches: int = 4, batch_size: int = 250):
+    rng = np.random.default_rng(0)
+    for _ in range(num_batches):
+        labels = rng.integers(0, num_classes, batch_size)
+        predictions = rng.dirichlet(np.full(num_classes, 0.2), size=batch_size)
+        # Sebagian besar prediksi menunjuk label yang benar dengan keyakinan tinggi
+        predictions[np.arange(batch_size), labels] += rng.uniform(0, 4, batch_size)
+        yield labels, predictions / predictions.sum(axis=1, keepdims=True)
+
+
+def test_threshold_sweep_matches_brute_force_mask():
+    evaluator = StreamingEvaluator()
+    all_labels, all_predictions = [], []
+    for labels, predictions in _random_batches():
+        evaluator.update(labels, predictions)
+        all_labels.append(labels)
+        all_predictions.append(predictions)
+    labels, predictions = np.concatenate(all_labels), np.concatenate(all_predictions)
+    validation = validate_predictions(predictions)
+    correct = validation["top_indices"] == labels
+
+    coverage, accuracy = evaluator.threshold_sweep()
+    assert coverage.shape == accuracy.shape == (NUM_BINS, NUM_BINS)
+    for c in range(0, NUM_BINS, 7):
+        for g in range(0, NUM_BINS, 7):
+            mask = (validation["top_confidences"] >= c) & (validation["confidence_gaps"] >= g)
+            assert coverage[c, g] == mask.mean()
+            expected_accuracy = correct[mask].mean() if mask.any() else 0.0
+            np.testing.assert_allclose(accuracy[c, g], expected_accuracy)
+
+
+def test_confusion_matrix_and_per_class_metrics():
+    evaluator = StreamingEvaluator(num_classes=3)
+    labels = np.array([0, 0, 1, 2])
+    predictions = np.eye(3)[[0, 1, 1, 2]]
+    evaluator.update(labels, predictions)
+    assert evaluator.confusion.tolist() == [[1, 1, 0], [0, 1, 0], [0, 0, 1]]
+    metrics = evaluator.per_class_metrics()
+    assert metrics[0]["recall"] == 0.5 and metrics[1]["precision"] == 0.5
+    assert [row["support"] for row in metrics] == [2, 1, 1]
@@ -0,0 +1,80 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from inference_executor import InferenceExecutor, InferenceTimeoutError, ServerBusyError
+
+
+def _wait_for(condition, timeout_s: float = 5.0) -> None:
+    deadline = time.perf_counter() + timeout_s
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise AssertionError("kondisi tidak tercapai")
+        time.sleep(0.01)
+
+
+def _occupy(executor: InferenceExecutor, release: threading.Event) -> threading.Thread:
+    """Menjalankan satu permintaan yang memegang slot sampai `release` diset."""
+    thread = threading.Thread(target=executor.run, args=(release.wait,), daemon=True)
+    thread.start()
+    return thread
+
+
+def test_run_returns_result():
+    executor = InferenceExecutor(max_concurrency=1, max_queue=1, timeout_s=5)
+    assert executor.run(lambda x: x * 2, 21) == 42
+
+
+def test_rejects_when_queue_is_full():
+    executor = InferenceExecutor(max_concurrency=1, max_queue=1, timeout_s=5)
+    release = threading.Event()
+    running = _occupy(executor, release)
+    _wait_for(lambda: executor.stats()["running"] == 1)
+    queued = _occupy(executor, release)
+    _wait_for(lambda: executor.stats()["waiting"] == 1)
+
+    with pytest.raises(ServerBusyError) as error:
+        executor.run(lambda: None)
+    assert error.value.position == 2
+    assert executor.stats()["rejected"] == 1
+
+    release.set()
+    running.join(5)
+    queued.join(5)
+    assert executor.stats() == {"waiting": 0, "running": 0, "rejected": 1, "timed_out": 0}
+
+
+def test_queued_request_is_cancelled_on_timeout():
+    executor = InferenceExecutor(max_concurrency=1, max_queue=2, timeout_s=5)
+    release = threading.Event()
+    running = _occupy(executor, release)
+    _wait_for(lambda: executor.stats()["running"] == 1)
+
+    called, positions = [], []
+    with pytest.raises(InferenceTimeoutError):
+        executor.run(lambda: called.append(True), on_queued=positions.append, timeout_s=0.3)
+    assert positions == [1]
+    assert executor.stats()["waiting"] == 0
+    assert executor.stats()["timed_out"] == 1
+
+    release.set()
+    running.join(5)
+    # Permintaan yang dibatalkan tidak pernah dijalankan setelah slot kosong
+    executor.run(lambda: None)
+    assert called == []
+
+
+def test_timeout_error_from_fn_is_propagated():
+    executor = InferenceExecutor(max_concurrency=1, max_queue=1, timeout_s=5)
+
+    def fn():
+        raise socket.timeout("server inferensi tidak menjawab")
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError) as error:
+        executor.run(fn)
+    assert not isinstance(error.value, InferenceTimeoutError)
+    assert time.perf_counter() - started < 1
+    assert executor.stats()["timed_out"] == 0
@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache("model", max_size=2, cache_dir=None)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    assert cache.get("a") is not None  # "a" jadi yang terbaru dipakai
+    cache.put("c", [3.0])
+    assert cache.get("b") is None
+    np.testing.assert_array_equal(cache.get("a"), [1.0])
+    np.testing.assert_array_equal(cache.get("c"), [3.0])
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "size": 2, "max_size": 2}
+
+
+def test_entries_are_read_only():
+    cache = PredictionCache("model", cache_dir=None)
+    cache.put("a", np.array([0.2, 0.8]))
+    assert not cache.get("a").flags.writeable
+
+
+def test_key_depends_on_image_and_model():
+    first, second = PredictionCache("model-1", cache_dir=None), PredictionCache("model-2", cache_dir=None)
+    assert first.make_key(b"daun") == first.make_key(b"daun")
+    assert first.make_key(b"daun") != first.make_key(b"daun lain")
+    assert first.make_key(b"daun") != second.make_key(b"daun")
+
+
+def test_disk_cache_survives_restart_and_removes_evicted_files(tmp_path):
+    cache = PredictionCache("model", max_size=2, cache_dir=str(tmp_path))
+    for key, value in [("a", 1.0), ("b", 2.0), ("c", 3.0)]:
+        cache.put(key, [value])
+    assert sorted(os.listdir(tmp_path)) == ["b.npy", "c.npy"]
+
+    reloaded = PredictionCache("model", max_size=2, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(reloaded.get("b"), [2.0])
+    np.testing.assert_array_equal(reloaded.get("c"), [3.0])
+    assert reloaded.get("a") is None
+
+
+def test_reload_keeps_most_recent_entries_and_drops_corrupt_files(tmp_path):
+    cache = PredictionCache("model", max_size=3, cache_dir=str(tmp_path))
+    for mtime, key in enumerate(["a", "b", "c"]):
+        cache.put(key, [float(mtime)])
+        os.utime(tmp_path / f"{key}.npy", (mtime, mtime))
+    (tmp_path / "rusak.npy").write_bytes(b"bukan npy")
+    os.utime(tmp_path / "rusak.npy", (10, 10))
+
+    reloaded = PredictionCache("model", max_size=2, cache_dir=str(tmp_path))
+    assert reloaded.get("a") is None
+    np.testing.assert_array_equal(reloaded.get("c"), [2.0])
+    assert sorted(os.listdir(tmp_path)) == ["c.npy"]
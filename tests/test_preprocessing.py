@@ -0,0 +1,82 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from preprocessing import (
+    ImageTooLargeError,
+    normalize_pixels,
+    open_image,
+    prepare_image,
+    preprocess_batch,
+    preprocess_into,
+    thumbnail_image,
+)
+
+
+def _png_bytes(width: int, height: int) -> io.BytesIO:
+    pixels = np.random.default_rng(0).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def test_normalize_pixels_matches_mobilenet_v2_preprocess_input():
+    tf = pytest.importorskip("tensorflow")
+    pixels = np.random.default_rng(0).integers(0, 256, size=(2, 8, 8, 3)).astype(np.uint8)
+    expected = tf.keras.applications.mobilenet_v2.preprocess_input(pixels.astype(np.float32))
+    np.testing.assert_allclose(normalize_pixels(pixels), expected, atol=1e-6)
+
+
+def test_normalize_pixels_range_and_dtype():
+    result = normalize_pixels(np.array([0, 127.5, 255], dtype=np.float32))
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, [-1.0, 0.0, 1.0], atol=1e-6)
+
+
+def test_preprocess_into_writes_in_place_into_batch_slot():
+    batch = np.zeros((2, 96, 128, 3), dtype=np.float32)
+    with open_image(_png_bytes(300, 200)) as image:
+        result = preprocess_into(image, batch[1])
+    assert result.shape == (96, 128, 3)
+    assert result.dtype == np.float32
+    assert np.shares_memory(result, batch)
+    assert batch[1].min() >= -1 and batch[1].max() <= 1 and batch[1].any()
+    assert not batch[0].any()
+
+
+def test_preprocess_batch_shape_follows_width_height_target():
+    with open_image(_png_bytes(50, 40)) as image:
+        batch = preprocess_batch([image, image], target_size=(64, 32))
+    assert batch.shape == (2, 32, 64, 3)
+    assert batch.dtype == np.float32
+
+
+def test_open_image_rejects_images_above_pixel_limit():
+    with pytest.raises(ImageTooLargeError):
+        open_image(_png_bytes(100, 100), max_pixels=100 * 100 - 1)
+    with open_image(_png_bytes(100, 100), max_pixels=100 * 100) as image:
+        assert image.size == (100, 100)
+
+
+def _jpeg_bytes(width: int, height: int) -> io.BytesIO:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (90, 160, 60)).save(buffer, format="JPEG")
+    buffer.seek(0)
+    return buffer
+
+
+def test_thumbnail_image_fits_display_size():
+    with open_image(_jpeg_bytes(2000, 1500)) as image:
+        thumbnail = thumbnail_image(image, max_size=(256, 256))
+    assert thumbnail.size == (256, 192)
+
+
+def test_prepare_image_uses_draft_mode_on_fresh_jpeg_handle():
+    with open_image(_jpeg_bytes(2000, 1500)) as image:
+        prepared = prepare_image(image, (224, 224))
+        # Draft mode mengecilkan saat dekode (1/4 di sini), jadi gambar sumber tidak pernah dimuat penuh
+        assert image.size == (500, 375)
+    assert prepared.size == (224, 224)
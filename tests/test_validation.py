@@ -0,0 +1,31 @@
+import numpy as np
+
+from inference import CERTAINTY_GAP_THRESHOLD, CONFIDENCE_THRESHOLD, validate_predictions
+
+
+def test_thresholds_accept_and_reject():
+    predictions = np.array([
+        [0.90, 0.05, 0.05],  # yakin dan pasti
+        [0.70, 0.20, 0.10],  # keyakinan di bawah ambang
+        [0.10, 0.46, 0.44],  # jarak keyakinan terlalu kecil
+    ], dtype=np.float32)
+    validation = validate_predictions(predictions, confidence_threshold=80, certainty_gap_threshold=25)
+    assert validation["top_indices"].tolist() == [0, 0, 1]
+    np.testing.assert_allclose(validation["top_confidences"], [90, 70, 46], atol=1e-4)
+    np.testing.assert_allclose(validation["confidence_gaps"], [85, 50, 2], atol=1e-4)
+    assert validation["accepted"].tolist() == [True, False, False]
+
+
+def test_single_vector_is_treated_as_batch_of_one():
+    validation = validate_predictions(np.array([0.05, 0.95]))
+    assert validation["top_indices"].tolist() == [1]
+    assert validation["accepted"].tolist() == [True]
+
+
+def test_matches_per_image_sorting_logic():
+    predictions = np.random.default_rng(0).dirichlet(np.full(15, 0.3), size=500)
+    validation = validate_predictions(predictions)
+    for row, probabilities in enumerate(predictions):
+        top, second = np.sort(probabilities)[::-1][:2] * 100
+        assert validation["top_indices"][row] == np.argmax(probabilities)
+        assert validation["accepted"][row] == (top >= CONFIDENCE_THRESHOLD and top - second >= CERTAINTY_GAP_THRESHOLD)
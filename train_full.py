@@ -0,0 +1,267 @@
+"""Training end-to-end AgroDetect dengan cache dataset di disk, mixed precision, dan XLA.
+
+Berbeda dengan pipeline notebook (decode + resize JPEG setiap epoch, float32, tanpa kompilasi):
+1. Dataset didekode dan diubah ukurannya sekali ke array uint8 (N, 224, 224, 3) .npy yang
+   di-memory-map; epoch berikutnya hanya membaca piksel jadi.
+2. Augmentasi diterapkan pada tensor yang di-cache di dalam pipeline tf.data.
+3. Mixed precision (`mixed_float16`) diaktifkan otomatis bila ada GPU yang mendukung, dan
+   `jit_compile` (XLA) dipakai untuk langkah training.
+4. Opsional fine-tuning blok teratas MobileNetV2 setelah head dilatih.
+
+Model akhir selalu disimpan dalam float32 sehingga aplikasi (CPU) memuatnya seperti biasa.
+`--compare-notebook` mengukur satu epoch pipeline notebook pada mesin yang sama sebagai pembanding.
+
+Contoh:
+    python train_full.py --data-dir /path/ke/PlantVillage --epochs 20 --fine-tune-blocks 2 --compare-notebook
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras.applications import mobilenet_v2
+from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+
+from inference import MODEL_PATH
+from training import (
+    AUTOTUNE,
+    BATCH_SIZE,
+    IMG_SIZE,
+    assemble_model,
+    build_augmenter,
+    build_backbone,
+    build_head,
+    load_split,
+)
+
+DATASET_CACHE_DIR = "dataset_cache"
+
+
+# --- Cache Dataset uint8 ---
+def cache_split(data_dir: str, subset: str, cache_dir: str = DATASET_CACHE_DIR, refresh: bool = False) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """Mendekode split sekali ke array uint8 .npy lalu mengembalikannya sebagai memory-map."""
+    os.makedirs(cache_dir, exist_ok=True)
+    images_path = os.path.join(cache_dir, f"{subset}_images.npy")
+    labels_path = os.path.join(cache_dir, f"{subset}_labels.npy")
+    metadata_path = os.path.join(cache_dir, f"{subset}_metadata.json")
+    # shuffle=True wajib: tanpa itu Keras membagi daftar file yang terurut per kelas (split tidak sama
+    # dengan notebook). Gambar dan label ditulis bersamaan, jadi urutan iterasi tidak berpengaruh.
+    dataset = load_split(data_dir, subset, batch_size=64)
+    metadata = {
+        "data_dir": os.path.abspath(data_dir),
+        "file_paths": len(dataset.file_paths),
+        "class_names": dataset.class_names,
+        "img_size": list(IMG_SIZE),
+        "split": "seeded-shuffle",
+    }
+    cached = False
+    if not refresh and os.path.exists(metadata_path):
+        with open(metadata_path) as metadata_file:
+            cached = json.load(metadata_file) == metadata
+
+    if not cached:
+        started = time.perf_counter()
+        num_images = len(dataset.file_paths)
+        images = np.lib.format.open_memmap(images_path, mode="w+", dtype=np.uint8, shape=(num_images,) + IMG_SIZE + (3,))
+        labels = np.lib.format.open_memmap(labels_path, mode="w+", dtype=np.int32, shape=(num_images,))
+        offset = 0
+        for batch_images, batch_labels in dataset.prefetch(AUTOTUNE):
+            count = len(batch_labels)
+            # image_dataset_from_directory menghasilkan float32 0-255; dibulatkan kembali ke uint8
+            images[offset:offset + count] = np.clip(np.rint(batch_images.numpy()), 0, 255).astype(np.uint8)
+            labels[offset:offset + count] = batch_labels.numpy()
+            offset += count
+        images.flush()
+        labels.flush()
+        del images, labels
+        with open(metadata_path, "w") as metadata_file:
+            json.dump(metadata, metadata_file, indent=2)
+        print(f"💾 Split {subset} di-cache ({num_images} gambar) dalam {time.perf_counter() - started:.1f} dtk")
+
+    return np.load(images_path, mmap_mode="r"), np.load(labels_path, mmap_mode="r"), metadata["class_names"]
+
+
+def cached_dataset(
+    images: np.ndarray,
+    labels: np.ndarray,
+    batch_size: int = BATCH_SIZE,
+    augment: bool = False,
+    normalize: bool = True,
+) -> tf.data.Dataset:
+    """Pipeline tf.data dari array uint8 yang di-memory-map: ambil batch, augmentasi, normalisasi.
+
+    Dengan `normalize=False` batch dikembalikan sebagai float32 0-255 (mis. untuk distilasi, yang
+    mengubah ukuran gambar secara berbeda untuk teacher dan student).
+    """
+    num_images = len(labels)
+
+    def gather(batch_indices):
+        # Indeks diurutkan agar pembacaan memory-map lebih berurutan (gambar & label tetap sejajar)
+        batch_indices = np.sort(batch_indices)
+        return images[batch_indices], labels[batch_indices]
+
+    def load_batch(batch_indices):
+        batch_images, batch_labels = tf.numpy_function(gather, [batch_indices], (tf.uint8, tf.int32))
+        batch_images.set_shape((None,) + IMG_SIZE + (3,))
+        batch_labels.set_shape((None,))
+        return batch_images, batch_labels
+
+    dataset = tf.data.Dataset.range(num_images)
+    if augment:
+        dataset = dataset.shuffle(num_images, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(load_batch, num_parallel_calls=AUTOTUNE)
+    augmenter = build_augmenter() if augment else None
+
+    def to_model_input(batch_images, batch_labels):
+        batch_images = tf.cast(batch_images, tf.float32)
+        if augmenter is not None:
+            batch_images = augmenter(batch_images, training=True)
+        return (mobilenet_v2.preprocess_input(batch_images) if normalize else batch_images), batch_labels
+
+    return dataset.map(to_model_input, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+
+# --- Pipeline Notebook (pembanding) ---
+def notebook_datasets(data_dir: str) -> tuple[tf.data.Dataset, tf.data.Dataset]:
+    """Pipeline seperti notebook: decode JPEG setiap epoch, augmentasi di map, tanpa cache."""
+    augmenter = build_augmenter()
+    train_ds = load_split(data_dir, "training").map(
+        lambda x, y: (mobilenet_v2.preprocess_input(augmenter(x, training=True)), y), num_parallel_calls=AUTOTUNE
+    ).prefetch(AUTOTUNE)
+    val_ds = load_split(data_dir, "validation").map(
+        lambda x, y: (mobilenet_v2.preprocess_input(x), y), num_parallel_calls=AUTOTUNE
+    ).prefetch(AUTOTUNE)
+    return train_ds, val_ds
+
+
+# --- Mixed Precision & Pengukuran ---
+def resolve_mixed_precision(mode: str) -> bool:
+    """Menentukan apakah mixed precision dipakai: 'auto' hanya jika ada GPU compute capability >= 7.0."""
+    if mode != "auto":
+        return mode == "on"
+    for gpu in tf.config.list_physical_devices("GPU"):
+        capability = tf.config.experimental.get_device_details(gpu).get("compute_capability", (0, 0))
+        if capability >= (7, 0):
+            return True
+    return False
+
+
+class EpochTimer(keras.callbacks.Callback):
+    """Mencatat durasi setiap epoch dan throughput gambar/detik."""
+
+    def __init__(self, num_images: int):
+        super().__init__()
+        self.num_images = num_images
+        self.epochs: list[dict] = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self._started
+        self.epochs.append({"epoch": epoch + 1, "seconds": seconds, "images_per_s": self.num_images / seconds})
+
+
+def summarize_epochs(epochs: list[dict]) -> dict:
+    # Epoch pertama menanggung biaya tracing/kompilasi XLA, jadi dilaporkan terpisah
+    steady = epochs[1:] or epochs
+    return {
+        "first_epoch_s": epochs[0]["seconds"],
+        "steady_epoch_s": float(np.mean([epoch["seconds"] for epoch in steady])),
+        "steady_images_per_s": float(np.mean([epoch["images_per_s"] for epoch in steady])),
+    }
+
+
+def unfreeze_top_blocks(base_model: keras.Model, num_blocks: int) -> None:
+    """Membuka `num_blocks` blok inverted-residual teratas (plus konvolusi akhir); BatchNorm tetap beku."""
+    block_names = {f"block_{index}_" for index in range(17 - num_blocks, 17)}
+    base_model.trainable = True
+    for layer in base_model.layers:
+        is_top = layer.name.startswith(("Conv_1", "out_relu")) or any(layer.name.startswith(name) for name in block_names)
+        layer.trainable = is_top and not isinstance(layer, keras.layers.BatchNormalization)
+
+
+def compile_model(model: keras.Model, learning_rate: float, jit_compile: bool) -> None:
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate),
+        loss="sparse_categorical_crossentropy",
+        metrics=["accuracy"],
+        jit_compile=jit_compile,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Training end-to-end AgroDetect (cache dataset, mixed precision, XLA, fine-tuning).")
+    parser.add_argument("--data-dir", required=True, help="Folder PlantVillage (berisi subfolder per kelas).")
+    parser.add_argument("--cache-dir", default=DATASET_CACHE_DIR)
+    parser.add_argument("--refresh-cache", action="store_true")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--mixed-precision", default="auto", choices=["auto", "on", "off"])
+    parser.add_argument("--no-jit", dest="jit_compile", action="store_false", help="Nonaktifkan XLA jit_compile.")
+    parser.add_argument("--fine-tune-blocks", type=int, default=0, help="Jumlah blok MobileNetV2 teratas yang ikut dilatih.")
+    parser.add_argument("--fine-tune-epochs", type=int, default=10)
+    parser.add_argument("--compare-notebook", action="store_true", help="Ukur satu epoch pipeline notebook sebagai pembanding.")
+    parser.add_argument("--output", default=MODEL_PATH)
+    parser.add_argument("--report", default="train_report.json")
+    args = parser.parse_args()
+
+    train_images, train_labels, class_names = cache_split(args.data_dir, "training", args.cache_dir, args.refresh_cache)
+    val_images, val_labels, _ = cache_split(args.data_dir, "validation", args.cache_dir, args.refresh_cache)
+    train_ds = cached_dataset(train_images, train_labels, args.batch_size, augment=True)
+    val_ds = cached_dataset(val_images, val_labels, args.batch_size)
+
+    use_mixed_precision = resolve_mixed_precision(args.mixed_precision)
+    keras.mixed_precision.set_global_policy("mixed_float16" if use_mixed_precision else "float32")
+    print(f"⚙️  Mixed precision: {'aktif' if use_mixed_precision else 'nonaktif'}, XLA: {'aktif' if args.jit_compile else 'nonaktif'}")
+
+    report = {"mixed_precision": use_mixed_precision, "jit_compile": args.jit_compile, "num_train_images": len(train_labels)}
+    callbacks = [EarlyStopping(patience=5, restore_best_weights=True), ReduceLROnPlateau(patience=3)]
+
+    base_model = build_backbone()
+    model = assemble_model(base_model, build_head(len(class_names)))
+    compile_model(model, 1e-3, args.jit_compile)
+    timer = EpochTimer(len(train_labels))
+    model.fit(train_ds, validation_data=val_ds, epochs=args.epochs, callbacks=callbacks + [timer])
+    report["head_training"] = {"epochs": timer.epochs, **summarize_epochs(timer.epochs)}
+
+    if args.fine_tune_blocks > 0:
+        unfreeze_top_blocks(base_model, args.fine_tune_blocks)
+        compile_model(model, 1e-5, args.jit_compile)
+        timer = EpochTimer(len(train_labels))
+        model.fit(train_ds, validation_data=val_ds, epochs=args.fine_tune_epochs, callbacks=callbacks + [timer])
+        report["fine_tuning"] = {"blocks": args.fine_tune_blocks, "epochs": timer.epochs, **summarize_epochs(timer.epochs)}
+
+    # Simpan dalam float32 agar aplikasi di CPU tidak menjalankan komputasi float16
+    keras.mixed_precision.set_global_policy("float32")
+    export_model = assemble_model(build_backbone(weights=None), build_head(len(class_names)))
+    export_model.set_weights(model.get_weights())
+    export_model.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+    export_model.save(args.output)
+    print(f"💾 Model disimpan ke {args.output}")
+
+    if args.compare_notebook:
+        notebook_train_ds, notebook_val_ds = notebook_datasets(args.data_dir)
+        notebook_model = assemble_model(build_backbone(), build_head(len(class_names)))
+        notebook_model.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+        timer = EpochTimer(len(train_labels))
+        notebook_model.fit(notebook_train_ds, validation_data=notebook_val_ds, epochs=2, callbacks=[timer])
+        report["notebook_pipeline"] = {"epochs": timer.epochs, **summarize_epochs(timer.epochs)}
+        speedup = report["notebook_pipeline"]["steady_epoch_s"] / report["head_training"]["steady_epoch_s"]
+        print(
+            f"\n{'Pipeline':<22}{'dtk/epoch':>12}{'gambar/dtk':>12}\n"
+            f"{'notebook':<22}{report['notebook_pipeline']['steady_epoch_s']:>12.1f}{report['notebook_pipeline']['steady_images_per_s']:>12.1f}\n"
+            f"{'cache + MP + XLA':<22}{report['head_training']['steady_epoch_s']:>12.1f}{report['head_training']['steady_images_per_s']:>12.1f}\n"
+            f"Percepatan: {speedup:.2f}x"
+        )
+
+    with open(args.report, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"📄 Laporan disimpan ke {args.report}")
+
+
+if __name__ == "__main__":
+    main()
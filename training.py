@@ -0,0 +1,308 @@
+"""Modul training AgroDetect: head klasifikasi dilatih di atas fitur backbone yang di-cache.
+
+Backbone MobileNetV2 dibekukan saat training (sama seperti notebook), jadi output
+`GlobalAveragePooling2D`-nya cukup dihitung sekali. Modul ini:
+
+1. Mengekstrak embedding validasi (tanpa augmentasi) dan beberapa tampilan teraugmentasi
+   dari data training, lalu menyimpannya sebagai array .npy float16 yang bisa di-memory-map.
+2. Melatih head Dense langsung pada fitur tersebut (hitungan menit, bukan jam).
+3. Menyusun kembali backbone + head menjadi `best_model.keras` yang bisa dimuat aplikasi.
+
+Fitur yang sudah diekstrak dipakai ulang selama dataset, backbone, dan jumlah tampilan sama,
+sehingga mengubah head, ambang batas, atau memilih subset kelas (`--classes`) tidak perlu
+mengekstrak ulang.
+
+Contoh:
+    python training.py --data-dir /path/ke/PlantVillage --augmented-views 3 --epochs 50
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+from tensorflow.keras.applications import MobileNetV2, mobilenet_v2
+from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+
+from inference import MODEL_PATH
+
+# --- Konfigurasi Dataset (sama dengan notebook) ---
+IMG_SIZE = (224, 224)
+BATCH_SIZE = 32
+VALIDATION_SPLIT = 0.2
+SEED = 123
+AUTOTUNE = tf.data.AUTOTUNE
+
+FEATURES_DIR = "features"
+FEATURE_DIM = 1280  # Lebar output GlobalAveragePooling2D pada MobileNetV2
+
+
+# --- Dataset ---
+def load_split(
+    data_dir: str,
+    subset: str,
+    batch_size: int = BATCH_SIZE,
+    shuffle: bool = True,
+    image_size: tuple[int, int] = IMG_SIZE,
+) -> tf.data.Dataset:
+    """Memuat split training/validasi PlantVillage dengan pembagian yang sama seperti notebook.
+
+    `image_size` (tinggi, lebar) hanya mengubah ukuran resize. Pembagian hanya sama dengan notebook
+    bila `shuffle=True`: Keras mengacak daftar file dengan `SEED` sebelum membagi, sedangkan dengan
+    `shuffle=False` split diambil dari daftar yang terurut per kelas sehingga kelasnya terpisah.
+    Untuk split yang benar dalam urutan file yang tetap, gunakan `split_file_paths`.
+    """
+    return tf.keras.utils.image_dataset_from_directory(
+        data_dir,
+        validation_split=VALIDATION_SPLIT,
+        subset=subset,
+        seed=SEED,
+        image_size=image_size,
+        batch_size=batch_size,
+        shuffle=shuffle,
+    )
+
+
+def split_file_paths(data_dir: str, subset: str) -> tuple[list[str], np.ndarray, list[str]]:
+    """Path file, label, dan nama kelas dari split `load_split` (teracak dengan SEED) tanpa mendekode gambar.
+
+    Dataset hasil `load_split` juga mengacak urutan iterasinya, jadi `file_paths`-nya tidak sejajar
+    dengan batch yang dihasilkan; pakai `dataset_from_paths` untuk membaca path ini secara berurutan.
+    """
+    dataset = load_split(data_dir, subset, batch_size=1)
+    class_indices = {class_name: index for index, class_name in enumerate(dataset.class_names)}
+    paths = list(dataset.file_paths)
+    labels = np.array([class_indices[os.path.relpath(path, data_dir).split(os.sep)[0]] for path in paths], dtype=np.int32)
+    return paths, labels, dataset.class_names
+
+
+def dataset_from_paths(
+    paths: list[str],
+    labels: np.ndarray,
+    batch_size: int = BATCH_SIZE,
+    image_size: tuple[int, int] = IMG_SIZE,
+) -> tf.data.Dataset:
+    """Dataset berurutan (tanpa pengacakan) dari daftar path: decode + resize seperti `load_split`."""
+
+    def load(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, image_size)
+        image.set_shape(tuple(image_size) + (3,))
+        return image, label
+
+    return (
+        tf.data.Dataset.from_tensor_slices((paths, labels))
+        .map(load, num_parallel_calls=AUTOTUNE)
+        .batch(batch_size)
+        .prefetch(AUTOTUNE)
+    )
+
+
+def build_augmenter() -> keras.Sequential:
+    """Augmentasi seperti notebook, memakai layer inti Keras (setara layer keras_cv di notebook)."""
+    return keras.Sequential(
+        [
+            layers.RandomFlip("horizontal"),
+            layers.RandomRotation(0.1),
+            layers.RandomZoom(0.1),
+            layers.RandomContrast(factor=0.1, value_range=(0, 255)),
+        ],
+        name="augmenter",
+    )
+
+
+# --- Arsitektur Model ---
+def build_backbone(weights: str | None = "imagenet") -> keras.Model:
+    """MobileNetV2 tanpa top yang dibekukan."""
+    base_model = MobileNetV2(input_shape=IMG_SIZE + (3,), include_top=False, weights=weights)
+    base_model.trainable = False
+    return base_model
+
+
+def build_head(num_classes: int) -> list[layers.Layer]:
+    """Layer head klasifikasi (sama dengan notebook) setelah GlobalAveragePooling2D."""
+    return [
+        layers.Dense(256, activation="relu"),
+        layers.Dropout(0.3),
+        # Softmax tetap float32 agar stabil saat mixed precision aktif
+        layers.Dense(num_classes, activation="softmax", dtype="float32"),
+    ]
+
+
+def build_feature_extractor(base_model: keras.Model) -> keras.Model:
+    """Backbone + GlobalAveragePooling2D: gambar terpraproses -> embedding 1280 dimensi."""
+    inputs = keras.Input(shape=IMG_SIZE + (3,))
+    x = base_model(inputs, training=False)
+    outputs = layers.GlobalAveragePooling2D()(x)
+    return keras.Model(inputs, outputs, name="feature_extractor")
+
+
+def assemble_model(base_model: keras.Model, head_layers: list[layers.Layer]) -> keras.Model:
+    """Menyusun backbone + head menjadi model lengkap dengan arsitektur yang sama seperti notebook."""
+    inputs = keras.Input(shape=IMG_SIZE + (3,))
+    x = base_model(inputs, training=False)
+    x = layers.GlobalAveragePooling2D()(x)
+    for layer in head_layers:
+        x = layer(x)
+    return keras.Model(inputs, x)
+
+
+# --- Cache Fitur Backbone ---
+def _feature_paths(features_dir: str, subset: str) -> tuple[str, str]:
+    return (
+        os.path.join(features_dir, f"{subset}_features.npy"),
+        os.path.join(features_dir, f"{subset}_labels.npy"),
+    )
+
+
+def extract_features(
+    feature_extractor: keras.Model,
+    dataset: tf.data.Dataset,
+    num_images: int,
+    features_path: str,
+    labels_path: str,
+    views: int = 1,
+    augmenter: keras.Sequential | None = None,
+) -> None:
+    """Menjalankan backbone sekali per tampilan dan menulis embedding langsung ke file .npy (float16)."""
+    features = np.lib.format.open_memmap(features_path, mode="w+", dtype=np.float16, shape=(views * num_images, FEATURE_DIM))
+    labels = np.lib.format.open_memmap(labels_path, mode="w+", dtype=np.int16, shape=(views * num_images,))
+    offset = 0
+    for _ in range(views):
+        for images, batch_labels in dataset:
+            if augmenter is not None:
+                images = augmenter(images, training=True)
+            embeddings = feature_extractor(mobilenet_v2.preprocess_input(images), training=False).numpy()
+            features[offset:offset + len(embeddings)] = embeddings
+            labels[offset:offset + len(embeddings)] = batch_labels.numpy()
+            offset += len(embeddings)
+    features.flush()
+    labels.flush()
+
+
+def prepare_features(data_dir: str, features_dir: str = FEATURES_DIR, augmented_views: int = 3, refresh: bool = False) -> dict:
+    """Mengekstrak (atau memakai ulang) fitur train/val dan mengembalikan metadata cache."""
+    os.makedirs(features_dir, exist_ok=True)
+    metadata_path = os.path.join(features_dir, "metadata.json")
+    train_ds = load_split(data_dir, "training")
+    val_ds = load_split(data_dir, "validation")
+    metadata = {
+        "data_dir": os.path.abspath(data_dir),
+        "class_names": train_ds.class_names,
+        "num_train_images": len(train_ds.file_paths),
+        "num_val_images": len(val_ds.file_paths),
+        "augmented_views": augmented_views,
+        "backbone": "MobileNetV2-imagenet",
+        "img_size": list(IMG_SIZE),
+        # Fitur validasi lama diekstrak dari split tanpa pengacakan (kelas terpisah); jangan dipakai ulang
+        "split": "seeded-shuffle",
+    }
+    if not refresh and os.path.exists(metadata_path):
+        with open(metadata_path) as metadata_file:
+            if json.load(metadata_file) == metadata:
+                print(f"♻️  Memakai fitur yang sudah di-cache di {features_dir}")
+                return metadata
+
+    feature_extractor = build_feature_extractor(build_backbone())
+    started = time.perf_counter()
+    extract_features(feature_extractor, val_ds.prefetch(AUTOTUNE), metadata["num_val_images"], *_feature_paths(features_dir, "val"))
+    extract_features(
+        feature_extractor,
+        train_ds.prefetch(AUTOTUNE),
+        metadata["num_train_images"],
+        *_feature_paths(features_dir, "train"),
+        views=augmented_views,
+        augmenter=build_augmenter(),
+    )
+    print(f"✅ Ekstraksi fitur selesai dalam {time.perf_counter() - started:.1f} dtk")
+    with open(metadata_path, "w") as metadata_file:
+        json.dump(metadata, metadata_file, indent=2)
+    return metadata
+
+
+def load_features(features_dir: str, subset: str) -> tuple[np.ndarray, np.ndarray]:
+    """Memuat fitur dan label sebagai memory-map (tidak dibaca seluruhnya ke RAM)."""
+    features_path, labels_path = _feature_paths(features_dir, subset)
+    return np.load(features_path, mmap_mode="r"), np.load(labels_path, mmap_mode="r")
+
+
+# --- Training Head ---
+def select_classes(features: np.ndarray, labels: np.ndarray, class_indices: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    """Mengambil subset kelas dari fitur yang di-cache dan memetakan ulang labelnya ke 0..K-1."""
+    remap = np.full(int(labels.max()) + 1, -1, dtype=np.int16)
+    remap[class_indices] = np.arange(len(class_indices), dtype=np.int16)
+    mask = remap[labels] >= 0
+    return features[mask], remap[labels[mask]]
+
+
+def train_head(
+    features_dir: str,
+    num_classes: int,
+    epochs: int = 50,
+    batch_size: int = 256,
+    class_indices: list[int] | None = None,
+) -> list[layers.Layer]:
+    """Melatih head Dense langsung pada embedding yang di-cache (opsional hanya untuk `class_indices`)."""
+    train_features, train_labels = load_features(features_dir, "train")
+    val_features, val_labels = load_features(features_dir, "val")
+    if class_indices is not None:
+        train_features, train_labels = select_classes(train_features, train_labels, class_indices)
+        val_features, val_labels = select_classes(val_features, val_labels, class_indices)
+        num_classes = len(class_indices)
+
+    head_layers = build_head(num_classes)
+    inputs = keras.Input(shape=(FEATURE_DIM,))
+    x = inputs
+    for layer in head_layers:
+        x = layer(x)
+    head = keras.Model(inputs, x, name="head")
+    head.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+
+    started = time.perf_counter()
+    head.fit(
+        train_features,
+        train_labels,
+        validation_data=(val_features, val_labels),
+        epochs=epochs,
+        batch_size=batch_size,
+        shuffle=True,
+        callbacks=[EarlyStopping(patience=5, restore_best_weights=True), ReduceLROnPlateau(patience=3)],
+    )
+    print(f"✅ Training head selesai dalam {time.perf_counter() - started:.1f} dtk")
+    return head_layers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latih head AgroDetect pada fitur MobileNetV2 yang di-cache.")
+    parser.add_argument("--data-dir", required=True, help="Folder PlantVillage (berisi subfolder per kelas).")
+    parser.add_argument("--features-dir", default=FEATURES_DIR)
+    parser.add_argument("--augmented-views", type=int, default=3, help="Jumlah tampilan teraugmentasi per gambar training.")
+    parser.add_argument("--refresh-features", action="store_true", help="Ekstrak ulang fitur meskipun cache tersedia.")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--classes", nargs="+", help="Latih hanya untuk subset kelas ini (nama folder dataset).")
+    parser.add_argument("--output", default=MODEL_PATH)
+    args = parser.parse_args()
+    # Aplikasi memetakan output model ke CLASS_NAMES (15 kelas), jadi model subset kelas tidak boleh
+    # menimpa model yang dilayani
+    if args.classes and os.path.abspath(args.output) == os.path.abspath(MODEL_PATH):
+        parser.error(f"--classes menghasilkan model dengan subset kelas; simpan ke --output selain {MODEL_PATH}.")
+
+    metadata = prepare_features(args.data_dir, args.features_dir, args.augmented_views, refresh=args.refresh_features)
+    class_indices = [metadata["class_names"].index(name) for name in args.classes] if args.classes else None
+    head_layers = train_head(
+        args.features_dir,
+        num_classes=len(metadata["class_names"]),
+        epochs=args.epochs,
+        class_indices=class_indices,
+    )
+    model = assemble_model(build_backbone(), head_layers)
+    model.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+    model.save(args.output)
+    print(f"💾 Model disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()